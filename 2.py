@@ -1,100 +1,30 @@
-import smbus2
 import time
 import tkinter as tk
 from tkinter import ttk
-from PIL import Image, ImageTk
+from image_cache import get_photo, SWITCH_IMAGE_SIZE
+from reference import parse_reference, CONDITION_NAMES
+from pin_table import PinTable
+from render import TableRenderer
 import RPi.GPIO as GPIO
+from bus import open_bus
+from hardware import MCP23017_ADDR_BASE, I2C_BUS
+from acquisition import AcquisitionWorker
+from diagnostics import DiagnosticsPanel
+from verdict import compile_expected, describe
+from pinmap import load_pin_map, compile_decoder
+from results import ResultLog
+from service import RemoteWorker, SCANNER_SOCKET, service_info
 
 # Set the GPIO mode to BCM (Broadcom SOC channel)
 GPIO.setmode(GPIO.BCM)
 GPIO.setwarnings(False)
 
-# Constants for I2C addresses
-TCA9548A_ADDR = 0x70  # Default I2C address for TCA9548A
-MCP23017_ADDR_BASE = 0x20  # Base I2C address for MCP23017
-
-# I2C bus number (usually 1 for Raspberry Pi)
-I2C_BUS = 1
-RETRY_COUNT = 5
-RETRY_DELAY = 0.5  # Delay in seconds between retries
-
-class TCA9548A:
-    def __init__(self, bus, address=TCA9548A_ADDR):
-        self.bus = bus
-        self.address = address
-
-    def select_channel(self, channel):
-        for attempt in range(RETRY_COUNT):
-            try:
-                self.bus.write_byte(self.address, 1 << channel)
-                selected = self.bus.read_byte(self.address)
-                if selected == (1 << channel):
-                    return
-            except OSError as e:
-                time.sleep(RETRY_DELAY)
-        print(f"Failed to select channel {channel} after retries.")
-
-class MCP23017:
-    def __init__(self, bus, address):
-        self.bus = bus
-        self.address = address
-
-    def configure_as_inputs_with_pullups(self):
-        for attempt in range(RETRY_COUNT):
-            try:
-                if(self.address == MCP23017_ADDR_BASE):
-                    # Set all A pins as inputs except the first pin (A0), which is an output (0b11111110 = 0xFE)
-                    self.bus.write_byte_data(self.address, 0x00, 0xFE)  # IODIRA register
-                    self.bus.write_byte_data(self.address, 0x01, 0xFF)  # IODIRB register (all B pins as inputs)
-                    # Enable pull-up resistors on all A and B pins
-                    self.bus.write_byte_data(self.address, 0x0C, 0xFF)  # GPPUA register
-                    self.bus.write_byte_data(self.address, 0x0D, 0xFF)  # GPPUB register
-                else:
-                    self.bus.write_byte_data(self.address, 0x00, 0xFF)  # IODIRA register
-                    self.bus.write_byte_data(self.address, 0x01, 0xFF)  # IODIRB register
-                    self.bus.write_byte_data(self.address, 0x0C, 0xFF)  # GPPUA register
-                    self.bus.write_byte_data(self.address, 0x0D, 0xFF)  # GPPUB register
-                    return
-            except OSError as e:
-                time.sleep(RETRY_DELAY)
-        print(f"Failed to configure MCP23017 at address {self.address:#02x} after retries.")
-
-    def is_connected(self):
-        for attempt in range(RETRY_COUNT):
-            try:
-                self.bus.read_byte_data(self.address, 0x00)
-                return True
-            except OSError:
-                time.sleep(RETRY_DELAY)
-        return False
-
-    def read_gpio(self):
-        try:
-            gpioa = self.bus.read_byte_data(self.address, 0x12)  # GPIOA register
-            gpiob = self.bus.read_byte_data(self.address, 0x13)  # GPIOB register
-            return gpioa, gpiob
-        except OSError as e:
-            print(f"Error reading GPIO from MCP23017 at address {self.address:#02x}: {e}")
-            return None, None
-    def write_pin_high(self, pin):
-        if pin < 8:
-            current_state = self.bus.read_byte_data(self.address, 0x14)  # OLATA register
-            new_state = current_state | (1 << pin)
-            self.bus.write_byte_data(self.address, 0x14, new_state)
-        else:
-            current_state = self.bus.read_byte_data(self.address, 0x15)  # OLATB register
-            new_state = current_state | (1 << (pin - 8))
-            self.bus.write_byte_data(self.address, 0x15, new_state)
-
-    def write_pin_low(self, pin):
-        if pin < 8:
-            current_state = self.bus.read_byte_data(self.address, 0x14)  # OLATA register
-            new_state = current_state & ~(1 << pin)
-            self.bus.write_byte_data(self.address, 0x14, new_state)
-        else:
-            current_state = self.bus.read_byte_data(self.address, 0x15)  # OLATB register
-            new_state = current_state & ~(1 << (pin - 8))
-            self.bus.write_byte_data(self.address, 0x15, new_state)
+SWITCH_ON_IMAGE = "/home/pi/Images/closed.jpg"
+SWITCH_OFF_IMAGE = "/home/pi/Images/open.jpg"
+
+# MCP23017 address -> BCM pin wired to its mirrored INTA/INTB output.
+# Leave empty to poll the expanders on the acquisition thread instead.
+INT_GPIO_PINS = {}
 
 class PatternInfoExtractorApp:
     USERS = {
@@ -108,9 +38,22 @@ class PatternInfoExtractorApp:
         self.master = master
         self.isOpen = False  # Initialize isOpen attribute
         self.logged_in = False
-        self.mcp_devices = []  # List to store MCP23017 instances
+        self.username = None
+        self.worker = None  # AcquisitionWorker that owns the I2C bus
         self.on_image_tk = None
         self.off_image_tk = None
+        self.table = None  # PinTable drawn on the main canvas
+        self.renderer = None  # TableRenderer applying pin changes to the table once per frame
+        self.diagnostics = None  # Hidden I2C diagnostics window, Ctrl+Shift+D
+        self.pin_map = load_pin_map()  # Fixture wiring: expander bit -> logical pin
+        self.last_states = None  # Pin states (pinmap.PinDecoder.decode) last applied to the table
+        self.last_snapshot = None  # Re-applied when the table is rebuilt
+        self.reference = None  # HarnessReference of the QR code being tested
+        self.verdict = None  # Verdict of the last applied snapshot
+        self.results = None  # ResultLog writing every finished test to disk
+        self.test_started = None  # time.time() when START was pressed, None while no test runs
+        self.test_scans = 0  # worker.scans at the start of the test
+        self.test_snapshots = 0
         self.switch_on_image_tk = None
         self.switch_off_image_tk = None
         self.login_frame = tk.Frame(master)
@@ -142,6 +85,7 @@ class PatternInfoExtractorApp:
         # Check if username and password are correct
         if username in self.USERS and self.USERS[username] == password:
             self.logged_in = True
+            self.username = username
             self.logged_in_user_label.config(text=f"Logged in as: {username}")
             self.login_frame.destroy()  # Close login UI
             self.create_main_ui()
@@ -156,6 +100,9 @@ class PatternInfoExtractorApp:
         self.login_error_label.grid(row=3, columnspan=2, pady=5)
 
     def create_main_ui(self):
+        # Switch images are decoded once and shared by every row
+        self.on_image_tk = get_photo(SWITCH_ON_IMAGE, SWITCH_IMAGE_SIZE, self.master)
+        self.off_image_tk = get_photo(SWITCH_OFF_IMAGE, SWITCH_IMAGE_SIZE, self.master)
         self.master.title("Pattern Information Extractor")
         self.master.configure(bg="#1E1E1E")
         self.master.attributes("-fullscreen", True)
@@ -183,6 +130,9 @@ class PatternInfoExtractorApp:
         close_button = tk.Button(qr_frame, text="Close", command=self.close_window, bg="#F44336", fg="white", font=("Arial", 16), padx=10)
         close_button.grid(row=0, column=3, padx=(10, 20), sticky="w")
 
+        self.verdict_label = tk.Label(qr_frame, text="", font=("Helvetica", 18, "bold"), fg="black")
+        self.verdict_label.grid(row=1, column=0, columnspan=4, pady=5)
+
         self.table_frame = ttk.Frame(self.master)
         self.table_frame.pack(fill=tk.BOTH, expand=True)
 
@@ -191,181 +141,157 @@ class PatternInfoExtractorApp:
 
         self.scrollbar = ttk.Scrollbar(self.table_frame, orient=tk.VERTICAL, command=self.canvas.yview)
         self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.canvas.config(yscrollcommand=self.scrollbar.set)
-
-        self.table_container = ttk.Frame(self.canvas)
-        self.canvas.create_window((0, 0), window=self.table_container, anchor="nw")
-        self.table_container.configure(width=800, height=400)
-
-        self.table_container.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
-        self.canvas.bind("<Configure>", self.update_canvas_width)
-
-        self.create_table()
+        self.table = PinTable(self.canvas, self.scrollbar, self.on_image_tk, self.off_image_tk)
+        # Snapshots are drained once per frame, so a fast scan rate never costs more than one redraw
+        self.renderer = TableRenderer(self.master, self.table, poll=self.detect_gnd_connections)
 
         self.init_i2c_devices()
+        self.diagnostics = DiagnosticsPanel(self.master, self.worker, self.renderer)
+        self.results = ResultLog()
+        self.results.start()
+        self.renderer.start()
 
     def init_i2c_devices(self):
-        try:
-            self.bus = smbus2.SMBus(I2C_BUS)
-            self.tca = TCA9548A(self.bus)
-            for i in range(8):
-                self.tca.select_channel(i)
-                addr = MCP23017_ADDR_BASE + i
-                mcp = MCP23017(self.bus, addr)
-                if mcp.is_connected():
-                    mcp.configure_as_inputs_with_pullups()
-                    self.mcp_devices.append(mcp)
-            if not self.isOpen: 
-                self.mcp_devices[0].write_pin_high(0)
-            else:
-                self.mcp_devices[0].write_pin_low(0)   
-        except Exception as e:
-            print(f"Error initializing I2C devices: {e}")
+        info = service_info(SCANNER_SOCKET)
+        if info is not None and info["outputs"].get(MCP23017_ADDR_BASE, 0) & 0x0001:
+            # A scanner service started with --com owns the bus and drives COM: follow its snapshots instead
+            self.worker = RemoteWorker(SCANNER_SOCKET)
+        elif info is not None:
+            # The service owns the bus but leaves A0 an input, so this app could never drive COM
+            raise SystemExit(f"The scanner service on {SCANNER_SOCKET} does not drive COM "
+                             f"(A0 of 0x{MCP23017_ADDR_BASE:02X}), restart it with --com.")
+        else:
+            # A0 of the base expander is the COM output, everything else is an input
+            self.worker = AcquisitionWorker(lambda: open_bus(I2C_BUS), outputs={MCP23017_ADDR_BASE: 0x0001},
+                                            gpio=GPIO, int_pins=INT_GPIO_PINS, pin_map=self.pin_map)
+        self.worker.start()
+        self.worker.write_pin(MCP23017_ADDR_BASE, 0, not self.isOpen)
 
     def logout(self):
+        self.end_test()
+        self.renderer.stop()
+        self.results.stop()
+        self.worker.stop()
         self.master.destroy()
         root = tk.Tk()
         app = PatternInfoExtractorApp(root)
         root.mainloop()
 
     def close_window(self):
+        self.end_test()
+        self.renderer.stop()
+        self.results.stop()
+        self.worker.stop()
         self.master.destroy()
         GPIO.cleanup()
 
-    def create_table(self):
-        columns = ["CODE", "DESCRIPTION", "STATUS"]
-        for col_index, col_name in enumerate(columns):
-            label = tk.Label(self.table_container, text=col_name, font=("Helvetica", 22, "bold"))
-            label.grid(row=0, column=col_index, padx=250, pady=5)
-
     def extract_and_update_data(self):
-        qr_value = self.qr_code_entry.get()
-        pins_numbers = qr_value[4:8]
-        conditions_numbers = qr_value[10:12]
-        conditions_string = qr_value[12:]
-        cdn_array = [conditions_string[i:i + 2] for i in range(0, len(conditions_string), 2)]
-
-        n_pins = int(pins_numbers)
-        n_cdns = int(conditions_numbers)
-
-        for widget in self.table_container.winfo_children():
-            widget.destroy()
-
-        self.create_table()
-
-        self.add_table_row("1", "LED", "", "LED", 1)
-
-        for i in range(1, n_pins + 1):
-            self.add_table_row(f" {i + 1}", f"PIN {i}", "Not Yet", "PIN", i + 1)
-
-        self.add_table_row(f" {n_pins + 2}", f"COM", "PIN ON" if self.isOpen else "PIN OFF", "COM", n_pins + 2)
-
-        for i in range(1, n_cdns + 1):
-            condition_name = self.get_condition_name(cdn_array[i - 1])
-            self.add_table_row(f"{n_pins + 2 + i}", condition_name, "Not Yet", "CDN", n_pins + 2 + i)
-
-    def add_table_row(self, col1, col2, status, typ, pin_number):
-        row_index = len(self.table_container.winfo_children()) // 3
-        self.table_container.columnconfigure(1, weight=1)
-        label_col1 = tk.Label(self.table_container, text=col1, font=("Helvetica", 16))
-        label_col1.grid(row=row_index, column=0, padx=5, pady=5)
-        label_col2 = tk.Label(self.table_container, text=col2, font=("Helvetica", 16))
-        label_col2.grid(row=row_index, column=1, padx=5, pady=5)
-
-        if col1 == "1":
-            self.run_and_stop = tk.Button(self.table_container, text='STOP' if self.isOpen else 'START', command=self.toggle_start, bg="#FF0000" if self.isOpen else "#00FF00", fg="white", font=("Arial", 16), padx=10)
-            self.run_and_stop.grid(row=row_index, column=2, padx=5, pady=5)
-        else:
-            switch_state = tk.BooleanVar()
-            switch_state.set(False)
-
-            on_image = Image.open("/home/pi/Images/closed.jpg")
-            off_image = Image.open("/home/pi/Images/open.jpg")
-
-            on_image = on_image.resize((100, 65), Image.LANCZOS)
-            off_image = off_image.resize((100, 65), Image.LANCZOS)
-
-            self.on_image_tk = ImageTk.PhotoImage(on_image)
-            self.off_image_tk = ImageTk.PhotoImage(off_image)
-
-            switch = tk.Label(self.table_container, image=self.off_image_tk, bg="#1E1E1E")
-            switch.grid(row=row_index, column=2, padx=5, pady=5)
-
-            switch.config(image=self.on_image_tk if switch_state.get() else self.off_image_tk)
-            switch.image = self.on_image_tk if switch_state.get() else self.off_image_tk
-            switch_state.trace_add('write', lambda *args: switch.config(image=self.on_image_tk if switch_state.get() else self.off_image_tk))
-
-        if typ == "COM":
-            self.COM_PIN = pin_number
-            label_col1.configure(bg='#FFE599', font=("Helvetica", 16))
-            label_col2.configure(bg='#FFE599', font=("Helvetica", 16))
-
-    def update_canvas_width(self, event):
-        pass
+        try:
+            reference = parse_reference(self.qr_code_entry.get().strip())
+        except ValueError as e:
+            print(f"Error reading QR code: {e}")
+            return
+
+        self.reference = reference
+        self.verdict = None
+        self.worker.set_reference(reference)  # Scan only the ports this reference uses
+        self.renderer.clear()  # Pending changes belong to the previous rows
+        self.table.set_rows(reference.rows)
+        self.last_states = None
+
+        for row_index, (code, description, typ, pin_number) in enumerate(reference.rows, start=1):
+            if typ == "LED":
+                self.run_and_stop = tk.Button(self.canvas, text='STOP' if self.isOpen else 'START', command=self.toggle_start, bg="#FF0000" if self.isOpen else "#00FF00", fg="white", font=("Arial", 16), padx=10)
+                self.table.place_widget(row_index, self.run_and_stop)
+            elif typ == "COM":
+                self.COM_PIN = pin_number
+
+        if self.last_snapshot is not None:
+            self.apply_snapshot(self.last_snapshot)
 
     def toggle_start(self):
         self.isOpen = not self.isOpen
-        if not self.isOpen: 
-            self.mcp_devices[0].write_pin_high(0)
+        if self.isOpen:
+            self.begin_test()
         else:
-            self.mcp_devices[0].write_pin_low(0)
+            self.end_test()
+        self.worker.write_pin(MCP23017_ADDR_BASE, 0, not self.isOpen)
         self.run_and_stop.config(text='STOP' if self.isOpen else 'START', bg="#FF0000" if self.isOpen else "#00FF00")
         if self.isOpen:
-            self.detect_gnd_connections()
+            self.worker.start_scanning()
         else:
-            self.master.after_cancel(self.detect_gnd_connections)
+            self.worker.stop_scanning()
 
     def detect_gnd_connections(self):
+        # Scanning happens on the acquisition thread; here we only apply its latest snapshot
         if self.isOpen:
-            for channel in range(8):
-                self.tca.select_channel(channel)
-                for mcp in self.mcp_devices:
-                    gpioa, gpiob = mcp.read_gpio()
-                    if mcp.address == MCP23017_ADDR_BASE:
-                        x = 1
-                    else:
-                        x = 0
-                    if gpioa is not None and gpiob is not None:
-                        for pin in range(x,8):
-                            if not (gpioa & (1 << pin)):
-                                self.switch_on(pin + 1 + channel * 16)
-                            else:
-                                self.switch_off(pin + 1 + channel * 16)
-                            if not (gpiob & (1 << pin)):
-                                self.switch_on(pin + 9 + channel * 16)
-                            else:
-                                self.switch_off(pin + 9 + channel * 16)
-            self.master.after(1000, self.detect_gnd_connections)
+            snapshot = self.worker.latest_snapshot()
+            if snapshot is not None:
+                self.apply_snapshot(snapshot)
+
+    def begin_test(self):
+        self.test_started = time.time()
+        self.test_scans = self.worker.scans
+        self.test_snapshots = 0
+
+    def end_test(self):
+        # Log the test that is running, judged on its last snapshot
+        if self.test_started is None:
+            return
+        if self.reference is not None and self.verdict is not None and self.last_snapshot is not None:
+            self.results.record(self.username, self.reference.code, self.test_started, time.time(), self.verdict,
+                                self.last_snapshot.devices, self.last_snapshot.words,
+                                self.worker.scans - self.test_scans, self.test_snapshots)
+        self.test_started = None
+
+    def apply_snapshot(self, snapshot):
+        self.last_snapshot = snapshot
+        if self.test_started is not None:
+            self.test_snapshots += 1
+        # Unreadable devices carry their last stable word, so decoding the whole sweep is safe
+        self.apply_states(compile_decoder(self.pin_map, snapshot.devices).decode(snapshot.words))
+        if self.reference is not None:
+            # Masks are compiled once per reference and device layout, judging is a few ANDs per device
+            expected = compile_expected(self.reference, snapshot.devices, self.pin_map)
+            self.show_verdict(expected.evaluate(snapshot.words, snapshot.failed))
+
+    def show_verdict(self, verdict):
+        if verdict == self.verdict:
+            return
+        self.verdict = verdict
+        self.verdict_label.config(text=describe(verdict), fg="#4CAF50" if verdict.passed else "#F44336")
+
+    def apply_states(self, states):
+        # Only touch the switches whose state changed since the last applied snapshot
+        previous = self.last_states
+        self.last_states = states
+        if previous is None or len(previous) != len(states):
+            changed = range(1, len(states))
+        elif previous == states:
+            return
+        else:
+            # States are 0/1 bytes, so pin p differs exactly when bit 8 * p of the XOR is set
+            diff = int.from_bytes(states, "little") ^ int.from_bytes(previous, "little")
+            changed = []
+            while diff:
+                changed.append(((diff & -diff).bit_length() - 1) // 8)
+                diff &= diff - 1
+        for pin in changed:
+            if states[pin]:
+                self.switch_on(pin)
+            else:
+                self.switch_off(pin)
 
     def switch_on(self, pin_number):
         row_index = pin_number + 1 # Assuming pin numbers start from 1
-        try:
-            switch = self.table_container.grid_slaves(row=row_index, column=2)[0]  # Get the switch widget
-            switch.config(image=self.on_image_tk)  # Update switch to show LED is ON
-        except IndexError:
-            print(f"Switch at row {row_index} not found.")
+        self.renderer.set_state(row_index, True)  # Switch shows LED is ON at the next frame
 
     def switch_off(self, pin_number):
         row_index = pin_number + 1 # Assuming pin numbers start from 1
-        try:
-            switch = self.table_container.grid_slaves(row=row_index, column=2)[0]  # Get the switch widget
-            switch.config(image=self.off_image_tk)  # Update switch to show LED is OFF
-        except IndexError:
-            print(f"Switch at row {row_index} not found.")
+        self.renderer.set_state(row_index, False)  # Switch shows LED is OFF at the next frame
 
     def get_condition_name(self, code):
-        condition_map = {
-            "Lo": "Locking",
-            "Co": "Coding",
-            "Sl": "Seclock",
-            "Cl": "Clips",
-            "Cp": "Cpa",
-            "Cv": "Cover",
-            "Se": "Seal",
-            "La": "Latch",
-            "Ad": "Additional Part"
-        }
-        return condition_map.get(code, "Unknown")
+        return CONDITION_NAMES.get(code, "Unknown")
 
 if __name__ == "__main__":
     try:
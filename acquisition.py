@@ -0,0 +1,281 @@
+import math
+import os
+import queue
+import threading
+import time
+from array import array
+from collections import namedtuple
+from continuity import ContinuityTester
+from debounce import Debouncer, DEBOUNCE_SAMPLES
+from hardware import TCA9548A, read_all_gpio, mux_groups
+from pinmap import DEFAULT_PIN_MAP
+from scan_plan import compile_scan_plan
+from scheduler import CycleScheduler
+from interrupts import InterruptMonitor
+from topology import TopologyManager, FIXTURE_ID
+
+DEFAULT_SCAN_RATE = 200.0  # Raw scans per second on the acquisition thread, HARNESS_SCAN_RATE overrides it
+IDLE_WAIT = 0.05  # Seconds the thread waits for commands while it is not polling
+SNAPSHOT_QUEUE_SIZE = 8  # Oldest snapshots are dropped when the consumer falls behind
+REPROBE_AFTER_FAILED_SCANS = 60  # Consecutive scans with unreadable devices before probing the bus again (~0.3 s)
+RECOVER_INTERVAL = 2.0  # Seconds between probes of known expanders that stopped answering
+
+# Immutable description of one expander, safe to hand to other threads
+DeviceInfo = namedtuple("DeviceInfo", ["channel", "address", "outputs"])
+
+# Debounced pin state of the harness at one point in time. words[i] is the GPIOA | GPIOB << 8 port
+# word of devices[i]; failed holds the indices of the devices that could not be read.
+PinSnapshot = namedtuple("PinSnapshot", ["timestamp", "sequence", "devices", "words", "failed"])
+
+def scan_rate():
+    # Read when a worker is created rather than at import, so a bad value can't stop the apps
+    value = os.environ.get("HARNESS_SCAN_RATE")
+    if value is None:
+        return DEFAULT_SCAN_RATE
+    try:
+        rate = float(value)
+    except ValueError:
+        rate = 0.0
+    if not (rate > 0 and math.isfinite(rate)):
+        print(f"Invalid HARNESS_SCAN_RATE {value!r}, scanning at {DEFAULT_SCAN_RATE:g} per second.")
+        return DEFAULT_SCAN_RATE
+    return rate
+
+def put_latest(items, item):
+    # Non-blocking put that drops the oldest items of a full queue, for consumers that only want the latest
+    while True:
+        try:
+            items.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                items.get_nowait()
+            except queue.Empty:
+                pass
+
+def drain_latest(items):
+    # Empty the queue and return its most recent item, or None if nothing new arrived
+    item = None
+    while True:
+        try:
+            item = items.get_nowait()
+        except queue.Empty:
+            return item
+
+class SnapshotPublisher:
+    # Debounce and publish half of the acquisition engines (AcquisitionWorker and
+    # multibus.MultiBusEngine), on the instance's devices, debouncer, words, failed, sequence
+    # and snapshots attributes.
+    def sample(self, words, failed=()):
+        for index in failed:
+            words[index] = self.debouncer.word(index)  # Keep the last stable value of unreadable devices
+        failed = tuple(failed)
+        if self.debouncer.update(words) or failed != self.failed:
+            self.words = self.debouncer.words(len(words))
+            self.failed = failed
+            self.publish()
+
+    def publish(self):
+        self.sequence += 1
+        put_latest(self.snapshots, PinSnapshot(time.monotonic(), self.sequence, self.devices, tuple(self.words), self.failed))
+
+    def latest_snapshot(self):
+        return drain_latest(self.snapshots)
+
+class AcquisitionWorker(SnapshotPublisher, threading.Thread):
+    # Background thread that owns the I2C bus: it discovers the expanders, scans them and runs
+    # every other bus command, so no I2C I/O (or retry sleep) ever happens on the Tk thread.
+    # Raw samples go through a Debouncer and a snapshot is only published when the debounced
+    # state changes, so the scan rate can be raised without flooding the consumer.
+    def __init__(self, open_bus, outputs=None, interval=None, gpio=None, int_pins=None, fixture_id=FIXTURE_ID,
+                 debounce=DEBOUNCE_SAMPLES, pin_map=DEFAULT_PIN_MAP):
+        super().__init__(daemon=True)
+        self.open_bus = open_bus  # Called on the worker thread, e.g. lambda: open_bus(I2C_BUS)
+        self.outputs = outputs or {}  # MCP23017 address -> mask of pins used as outputs
+        # Scan timing, achieved rate and jitter; interval defaults to 1 / scan_rate()
+        self.scheduler = CycleScheduler(interval or 1.0 / scan_rate())
+        self.gpio = gpio
+        self.int_pins = int_pins or {}  # MCP23017 address -> BCM pin wired to its INT output
+        self.fixture_id = fixture_id
+        self.pin_map = pin_map  # Locates the reference's pins for the scan plan
+        self.snapshots = queue.Queue(maxsize=SNAPSHOT_QUEUE_SIZE)
+        self.commands = queue.Queue()
+        self.continuity_results = queue.Queue()  # ContinuityMatrix (None on failure) per run_continuity()
+        self.scanning = threading.Event()
+        self.stopped = threading.Event()
+        self.bus = None
+        self.tca = None
+        self.topology = None
+        self.failed_scans = 0
+        self.next_recover = 0.0  # monotonic time of the next TopologyManager.recover()
+        self.mcp_devices = []  # List of (mux channel, MCP23017) pairs, only touched on this thread
+        self.groups = None  # mux_groups() of mcp_devices: channels read under one mux selection
+        self.devices = ()
+        self.words = array('H')
+        self.debouncer = Debouncer(debounce)
+        self.reference = None  # HarnessReference being tested, None to scan every pin
+        self.plan = None  # compile_scan_plan() of reference for the current devices
+        self.failed = ()
+        self.sequence = 0
+        self.scans = 0  # Raw scans done, for scan rate statistics
+        self.interrupt_monitor = None
+        self.pending_lock = threading.Lock()
+        self.pending_outputs = {}  # MCP23017 address -> (value, mask) waiting for flush_outputs
+        self.flush_queued = False
+
+    def run(self):
+        try:
+            self.bus = self.open_bus()
+        except (FileNotFoundError, OSError) as e:
+            print(f"Error: Could not open I2C bus: {e}")
+            return
+        try:
+            self.tca = TCA9548A(self.bus)
+            self.topology = TopologyManager(self.bus, self.tca, self.fixture_id, outputs=self.outputs)
+            self.set_devices(self.topology.load())
+            was_polling = False
+            while not self.stopped.is_set():
+                # With interrupts, poll only until the samples after an INT have settled
+                polling = self.scanning.is_set() and (self.interrupt_monitor is None or not self.debouncer.settled)
+                if polling and not was_polling:
+                    self.scheduler.reset()  # Resume on a fresh deadline instead of counting the pause as lateness
+                was_polling = polling
+                timeout = self.scheduler.delay() if polling else IDLE_WAIT
+                try:
+                    func, args = self.commands.get(timeout=timeout)
+                except queue.Empty:
+                    pass
+                else:
+                    try:
+                        func(*args)
+                    except Exception as e:
+                        print(f"Error in acquisition command {func.__name__}: {e}")
+                    continue
+                if polling and self.scheduler.due():
+                    self.scheduler.tick()
+                    self.scan()
+        finally:
+            if self.interrupt_monitor is not None and self.interrupt_monitor.running:
+                self.interrupt_monitor.stop()
+            self.bus.close()
+
+    def set_devices(self, mcp_devices):
+        if self.interrupt_monitor is not None and self.interrupt_monitor.running:
+            self.interrupt_monitor.stop()
+        self.mcp_devices = mcp_devices
+        self.groups = mux_groups(mcp_devices)
+        self.devices = tuple(DeviceInfo(channel, mcp.address, mcp.outputs) for channel, mcp in self.mcp_devices)
+        self.words = array('H', [0xFFFF]) * len(self.mcp_devices)
+        self.debouncer.reset()
+        self.plan = compile_scan_plan(self.reference, self.devices, self.pin_map) if self.reference is not None else None
+        if self.gpio is not None and self.int_pins:
+            lines = {}
+            for channel, mcp in self.mcp_devices:
+                if mcp.address in self.int_pins:
+                    lines.setdefault(self.int_pins[mcp.address], []).append((channel, mcp))
+            # Edge callbacks run on the RPi.GPIO thread; the bus is only read back here
+            self.interrupt_monitor = InterruptMonitor(self.gpio, self.tca, lines, self.on_pin_change,
+                                                      callback=lambda pin: self.submit(self.interrupt_monitor.handle_interrupt, pin))
+            if self.scanning.is_set():
+                self.interrupt_monitor.start()
+
+    def scan(self):
+        words, failed = read_all_gpio(self.tca, self.mcp_devices, self.plan, self.groups)
+        self.scans += 1
+        self.sample(words, failed)
+        self.failed_scans = self.failed_scans + 1 if failed else 0
+        if self.failed_scans >= REPROBE_AFTER_FAILED_SCANS:
+            # The cached topology no longer matches the fixture: probe the bus again
+            self.failed_scans = 0
+            self.set_devices(self.topology.rediscover())
+        elif self.topology.missing and time.monotonic() >= self.next_recover:
+            self.next_recover = time.monotonic() + RECOVER_INTERVAL
+            devices = self.topology.recover()
+            if devices is not None:
+                self.set_devices(devices)
+
+    def on_pin_change(self, channel, mcp, flags, captured, current):
+        words = array('H', self.words)
+        for index, (device_channel, device) in enumerate(self.mcp_devices):
+            if device is mcp:
+                words[index] = current
+        self.sample(words)
+
+    def submit(self, func, *args):
+        # Run func(*args) on the acquisition thread
+        self.commands.put((func, args))
+
+    def write_pin(self, address, pin, high):
+        self.write_outputs(address, 0xFFFF if high else 0x0000, 1 << pin)
+
+    def write_outputs(self, address, value, mask):
+        # Drive the output pins in mask of the expander at address. Changes made before the worker
+        # gets to them are merged, so each device gets at most one OLAT write per flush.
+        with self.pending_lock:
+            pending_value, pending_mask = self.pending_outputs.get(address, (0x0000, 0x0000))
+            self.pending_outputs[address] = ((pending_value & ~mask) | (value & mask), pending_mask | mask)
+            if self.flush_queued:
+                return
+            self.flush_queued = True
+        self.submit(self.flush_outputs)
+
+    def flush_outputs(self):
+        with self.pending_lock:
+            pending = self.pending_outputs
+            self.pending_outputs = {}
+            self.flush_queued = False
+        for address, (value, mask) in pending.items():
+            for channel, mcp in self.mcp_devices:
+                if mcp.address == address:
+                    if channel is not None:
+                        self.tca.select_channel(channel)
+                    mcp.write_outputs(value, mask)
+                    break
+            else:
+                print(f"MCP23017 at address {address:#02x} not found.")
+
+    def set_reference(self, reference):
+        # Only scan the ports holding the reference's pins (None: full sweep)
+        self.submit(self._set_reference, reference)
+
+    def _set_reference(self, reference):
+        self.reference = reference
+        self.plan = compile_scan_plan(reference, self.devices, self.pin_map) if reference is not None else None
+        self.debouncer.reset()  # Skipped ports jump to 0xFF, publish the new layout at once
+
+    def run_continuity(self):
+        # Continuity matrix of the fixture, measured on this thread between two scans
+        self.submit(self._run_continuity)
+
+    def _run_continuity(self):
+        matrix = ContinuityTester(self.tca, self.mcp_devices).run()
+        if matrix is None:
+            print("Continuity test failed: an expander could not be driven or read.")
+        self.continuity_results.put(matrix)
+
+    def set_scan_rate(self, rate):
+        # Target scans per second, applied between two scans
+        self.submit(self.scheduler.set_rate, rate)
+
+    def start_scanning(self):
+        self.submit(self._start_scanning)
+
+    def _start_scanning(self):
+        self.scanning.set()
+        self.debouncer.reset()  # The first scan is published as is
+        if self.interrupt_monitor is not None:
+            self.interrupt_monitor.start()
+            self.scan()  # One full read for the initial state, the INT lines report the rest
+
+    def stop_scanning(self):
+        self.submit(self._stop_scanning)
+
+    def _stop_scanning(self):
+        self.scanning.clear()
+        if self.interrupt_monitor is not None and self.interrupt_monitor.running:
+            self.interrupt_monitor.stop()
+
+    def stop(self, timeout=1.0):
+        self.stopped.set()
+        if self.is_alive():
+            self.join(timeout)
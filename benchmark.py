@@ -0,0 +1,193 @@
+import argparse
+import json
+import time
+import tracemalloc
+from bus import SimulatedBus
+from hardware import TCA9548A, MCP23017, read_all_gpio, mux_groups, MCP23017_ADDR_BASE
+from pin_table import PinTable
+from reference import parse_reference
+from retry import RetryPolicy
+
+# Headless benchmarks for the acquisition and UI paths, run against SimulatedBus.
+# Usage: python benchmark.py [--scans N] [--latency S] [--json FILE]  (no hardware needed)
+# The table benchmarks use a real Tk canvas when a display is available (e.g. under xvfb-run)
+# and a stub canvas otherwise.
+
+EXPANDER_COUNTS = [1, 2, 4, 8]
+PIN_COUNTS = [10, 100, 1000, 5000]
+
+class StubCanvas:
+    # Minimal Canvas stand-in: counts item operations instead of drawing
+    def __init__(self, width=1000, height=600):
+        self.width = width
+        self.height = height
+        self.items = 0
+        self.calls = 0
+        self.top = 0
+
+    def create_text(self, *args, **kwargs):
+        return self.create()
+
+    def create_rectangle(self, *args, **kwargs):
+        return self.create()
+
+    def create_image(self, *args, **kwargs):
+        return self.create()
+
+    def create_window(self, *args, **kwargs):
+        return self.create()
+
+    def create(self):
+        self.items += 1
+        self.calls += 1
+        return self.items
+
+    def coords(self, *args):
+        self.calls += 1
+
+    def itemconfigure(self, *args, **kwargs):
+        self.calls += 1
+
+    def configure(self, **kwargs):
+        self.calls += 1
+
+    def delete(self, *args):
+        self.calls += 1
+
+    def bind(self, *args):
+        pass
+
+    def tag_lower(self, *args):
+        pass
+
+    def yview_moveto(self, fraction):
+        self.top = 0
+
+    def canvasy(self, y):
+        return self.top + y
+
+    def winfo_width(self):
+        return self.width
+
+    def winfo_height(self):
+        return self.height
+
+class StubScrollbar:
+    def set(self, first, last):
+        pass
+
+def make_canvas():
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception:
+        return StubCanvas(), StubScrollbar(), None, "stub"
+    root.geometry("1000x600")
+    canvas = tk.Canvas(root)
+    canvas.pack(fill=tk.BOTH, expand=True)
+    scrollbar = tk.Scrollbar(root, command=canvas.yview)
+    root.update()
+    return canvas, scrollbar, root, "tk"
+
+def setup_harness(n_expanders, latency, error_rate=0.0):
+    channels = {channel: [MCP23017_ADDR_BASE + channel] for channel in range(n_expanders)}
+    bus = SimulatedBus(channels, latency=latency, error_rate=error_rate, seed=1)
+    retry = RetryPolicy()  # Fresh breaker state per run, the default policy is shared
+    tca = TCA9548A(bus, retry=retry)
+    devices = []
+    for channel in range(n_expanders):
+        tca.select_channel(channel)
+        devices.append((channel, MCP23017(bus, MCP23017_ADDR_BASE + channel, channel=channel, retry=retry)))
+    return bus, tca, devices
+
+def bench_scan(n_expanders, scans, latency, error_rate=0.0, grouped=True):
+    bus, tca, devices = setup_harness(n_expanders, latency, error_rate)
+    groups = mux_groups(devices) if grouped else None
+    read_all_gpio(tca, devices, groups=groups)  # Warm up: mux selection, first-call overhead
+    transactions = bus.transactions
+    start = time.perf_counter()
+    for _ in range(scans):
+        read_all_gpio(tca, devices, groups=groups)
+    elapsed = time.perf_counter() - start
+    transactions = bus.transactions - transactions
+    return {
+        "expanders": n_expanders,
+        "error_rate": error_rate,
+        "grouped": grouped,
+        "scans_per_second": scans / elapsed,
+        "transactions_per_scan": transactions / scans,
+        "us_per_transaction": elapsed / transactions * 1e6 if transactions else 0.0,
+    }
+
+def bench_table(canvas, scrollbar, root, n_pins):
+    reference = parse_reference(f"CbTp{n_pins:04d}Dc02LoCo")
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    table = PinTable(canvas, scrollbar, "", "")
+    start = time.perf_counter()
+    table.set_rows(reference.rows)
+    if root is not None:
+        root.update()
+    rebuild = time.perf_counter() - start
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    memory = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    start = time.perf_counter()
+    for row in range(1, len(reference.rows) + 1):
+        table.set_state(row, True)
+    if root is not None:
+        root.update()
+    update = time.perf_counter() - start
+    canvas.delete("all")
+    return {
+        "pins": n_pins,
+        "rebuild_ms": rebuild * 1e3,
+        "update_all_ms": update * 1e3,
+        "bytes_per_row": memory / len(reference.rows),
+        "slots": len(table.slots),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark harness scanning and table updates on a simulated bus")
+    parser.add_argument("--scans", type=int, default=200, help="scans per measurement")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated seconds per I2C transaction")
+    parser.add_argument("--error-rate", type=float, default=0.01, help="failure probability for the retry run")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    results = {"scan": [], "table": []}
+    print("Scan throughput")
+    for n_expanders in EXPANDER_COUNTS:
+        result = bench_scan(n_expanders, args.scans, args.latency)
+        results["scan"].append(result)
+        print(f"  {n_expanders} expander(s): {result['scans_per_second']:10.1f} scans/s, "
+              f"{result['transactions_per_scan']:5.1f} transactions/scan, "
+              f"{result['us_per_transaction']:8.1f} us/transaction")
+
+    result = bench_scan(EXPANDER_COUNTS[-1], args.scans, args.latency, grouped=False)
+    results["scan"].append(result)
+    print(f"  one channel at a time: {result['scans_per_second']:10.1f} scans/s, "
+          f"{result['transactions_per_scan']:5.1f} transactions/scan")
+
+    result = bench_scan(EXPANDER_COUNTS[-1], args.scans, args.latency, args.error_rate)
+    results["scan"].append(result)
+    print(f"  with {args.error_rate:.1%} errors: {result['scans_per_second']:10.1f} scans/s, "
+          f"{result['transactions_per_scan']:5.1f} transactions/scan")
+
+    canvas, scrollbar, root, kind = make_canvas()
+    print(f"Table rebuild ({kind} canvas)")
+    for n_pins in PIN_COUNTS:
+        result = bench_table(canvas, scrollbar, root, n_pins)
+        results["table"].append(result)
+        print(f"  {n_pins:5d} pins: rebuild {result['rebuild_ms']:7.2f} ms, "
+              f"update all {result['update_all_ms']:7.2f} ms, "
+              f"{result['bytes_per_row']:6.1f} bytes/row, {result['slots']} row slots")
+    if root is not None:
+        root.destroy()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import os
+import random
+import time
+from tracing import TracingBus
+
+try:
+    import smbus2
+except ImportError:  # Build servers without I2C only use the simulated backend
+    smbus2 = None
+
+# "smbus" talks to /dev/i2c-<n>, "sim" uses SimulatedBus; override with HARNESS_I2C_BACKEND=sim
+I2C_BACKEND = os.environ.get("HARNESS_I2C_BACKEND", "smbus")
+# Record every transaction with tracing.TracingBus; HARNESS_I2C_TRACE=0 turns it off
+I2C_TRACE = os.environ.get("HARNESS_I2C_TRACE", "1") != "0"
+
+def open_bus(bus_number, backend=None, trace=None):
+    backend = backend or I2C_BACKEND
+    if trace is None:
+        trace = I2C_TRACE
+    if backend == "sim":
+        bus = SimulatedBus()
+    elif smbus2 is None:
+        raise FileNotFoundError("smbus2 is not installed, set HARNESS_I2C_BACKEND=sim to use the simulated bus")
+    else:
+        bus = smbus2.SMBus(bus_number)
+    if trace:
+        bus = TracingBus(bus)
+    return bus
+
+class SimulatedMCP23017:
+    # Register file of one MCP23017 (IOCON.BANK = 0). grounded is the mask of pins the harness
+    # pulls to GND; inputs read 0 there and 1 elsewhere, outputs read back their OLAT bit.
+    # pulled is the mask of inputs held low through a wire by a pin of another expander, see
+    # SimulatedBus.connect.
+    def __init__(self, address):
+        self.address = address
+        self.registers = bytearray(0x16)
+        self.registers[0x00] = 0xFF  # IODIRA resets to inputs
+        self.registers[0x01] = 0xFF  # IODIRB
+        self.grounded = 0x0000
+        self.pulled = 0x0000
+
+    def word(self, reg):
+        return self.registers[reg] | (self.registers[reg + 1] << 8)
+
+    def driven_low(self):
+        # Output pins currently driving 0
+        return ~self.word(0x00) & ~self.word(0x14) & 0xFFFF
+
+    def gpio(self):
+        iodir = self.word(0x00)
+        olat = self.word(0x14)
+        return ((~(self.grounded | self.pulled) & iodir) | (olat & ~iodir)) & 0xFFFF
+
+    def set_grounded(self, grounded):
+        before = self.gpio()
+        self.grounded = grounded & 0xFFFF
+        changed = (before ^ self.gpio()) & self.word(0x04) & self.word(0x00)  # GPINTEN, inputs only
+        if changed:
+            current = self.gpio()
+            for port in range(2):
+                # INTCAP latches the port state on the first change, until INTCAP/GPIO is read
+                if (changed >> (8 * port)) & 0xFF and not self.registers[0x0E + port]:
+                    self.registers[0x10 + port] = (current >> (8 * port)) & 0xFF
+                self.registers[0x0E + port] |= (changed >> (8 * port)) & 0xFF
+
+    def interrupt_asserted(self):
+        return bool(self.registers[0x0E] or self.registers[0x0F])
+
+    def read(self, reg):
+        if reg in (0x12, 0x13):
+            value = (self.gpio() >> (8 * (reg - 0x12))) & 0xFF
+            self.registers[0x0E + reg - 0x12] = 0  # Reading GPIO clears the interrupt
+            return value
+        if reg in (0x10, 0x11):
+            self.registers[0x0E + reg - 0x10] = 0  # So does reading INTCAP
+        return self.registers[reg]
+
+    def write(self, reg, value):
+        if reg in (0x12, 0x13):
+            reg += 2  # Writing GPIO writes OLAT
+        if reg not in (0x0E, 0x0F, 0x10, 0x11):  # INTF/INTCAP are read-only
+            self.registers[reg] = value & 0xFF
+
+class SimulatedBus:
+    # In-memory stand-in for smbus2.SMBus: a TCA9548A at mux_address with MCP23017 register files
+    # behind its channels. latency is added to every transaction and error_rate is the chance of
+    # any transaction failing with OSError, like a NACK on a real bus.
+    def __init__(self, channels=None, mux_address=0x70, latency=0.0, error_rate=0.0, seed=None):
+        if channels is None:
+            channels = {channel: [0x20 + channel] for channel in range(8)}
+        self.mux_address = mux_address
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.mask = 0x00
+        self.expanders = {}  # (channel, address) -> SimulatedMCP23017
+        for channel, addresses in channels.items():
+            for address in addresses:
+                self.expanders[(channel, address)] = SimulatedMCP23017(address)
+        self.dead = set()  # (channel, address) pairs that NACK everything, (None, mux_address) for the mux
+        self.nets = []  # Wires of the simulated harness: lists of (channel, address, pin) connected together
+        self.transactions = 0
+        self.errors = 0
+
+    def expander(self, channel, address):
+        return self.expanders[(channel, address)]
+
+    def connect(self, *pins):
+        # Wire (channel, address, pin) tuples together: any of them driven low pulls the others low
+        self.nets.append(list(pins))
+        self.update_nets()
+
+    def update_nets(self):
+        for mcp in self.expanders.values():
+            mcp.pulled = 0x0000
+        for net in self.nets:
+            low = any(self.expanders[(channel, address)].driven_low() >> pin & 1 for channel, address, pin in net)
+            if low:
+                for channel, address, pin in net:
+                    self.expanders[(channel, address)].pulled |= 1 << pin
+
+    def transaction(self, address):
+        self.transactions += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.errors += 1
+            raise OSError(121, "Remote I/O error")
+        if address == self.mux_address:
+            if (None, address) in self.dead:
+                self.errors += 1
+                raise OSError(121, "Remote I/O error")
+            return []
+        # Every expander on an enabled channel with this address answers (wired-AND on reads)
+        targets = [mcp for (channel, addr), mcp in self.expanders.items()
+                   if addr == address and self.mask & (1 << channel) and (channel, addr) not in self.dead]
+        if not targets:
+            self.errors += 1
+            raise OSError(121, "Remote I/O error")
+        return targets
+
+    def write_byte(self, address, value):
+        self.transaction(address)
+        if address == self.mux_address:
+            self.mask = value & 0xFF
+
+    def read_byte(self, address):
+        self.transaction(address)
+        if address == self.mux_address:
+            return self.mask
+        return 0xFF
+
+    def read_byte_data(self, address, reg):
+        value = 0xFF
+        for mcp in self.transaction(address):
+            value &= mcp.read(reg)
+        return value
+
+    def write_byte_data(self, address, reg, value):
+        for mcp in self.transaction(address):
+            mcp.write(reg, value)
+        if self.nets:
+            self.update_nets()
+
+    def read_i2c_block_data(self, address, reg, length):
+        data = [0xFF] * length
+        for mcp in self.transaction(address):
+            for i in range(length):
+                data[i] &= mcp.read(reg + i)
+        return data
+
+    def write_i2c_block_data(self, address, reg, data):
+        for mcp in self.transaction(address):
+            for i, value in enumerate(data):
+                mcp.write(reg + i, value)
+        if self.nets:
+            self.update_nets()
+
+    def close(self):
+        pass
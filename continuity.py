@@ -0,0 +1,154 @@
+import time
+from hardware import read_all_gpio, mux_groups
+
+class ContinuityMatrix:
+    # Point-to-point connectivity of the harness. pins[i] is the (channel, address, bit) of test
+    # pin i and rows[i] is a bit-packed int with bit j set when pin j read low while pin i was
+    # driven low, i.e. the two are wired together (or shorted).
+    __slots__ = ("pins", "rows", "duration")
+
+    def __init__(self, pins, rows, duration=0.0):
+        self.pins = tuple(pins)
+        self.rows = tuple(rows)
+        self.duration = duration
+
+    def __len__(self):
+        return len(self.pins)
+
+    def connected(self, i, j):
+        return bool(self.rows[i] >> j & 1)
+
+    def nets(self):
+        # Groups of pins that are connected to each other, as sorted lists of pin indices.
+        # Pins connected to nothing are left out.
+        seen = 0
+        nets = []
+        for i, row in enumerate(self.rows):
+            if seen >> i & 1 or not row:
+                continue
+            net = row | (1 << i)
+            frontier = net
+            while frontier:
+                j = (frontier & -frontier).bit_length() - 1
+                frontier &= frontier - 1
+                grown = net | self.rows[j]
+                frontier |= grown & ~net
+                net = grown
+            seen |= net
+            nets.append([j for j in range(len(self.rows)) if net >> j & 1])
+        return nets
+
+    def asymmetric(self):
+        # (i, j) pairs seen from one side only: a diode, a flaky contact or a pin stuck low/high
+        pairs = []
+        for i, row in enumerate(self.rows):
+            others = row
+            while others:
+                j = (others & -others).bit_length() - 1
+                others &= others - 1
+                if not self.rows[j] >> i & 1:
+                    pairs.append((i, j))
+        return pairs
+
+    def compare(self, expected):
+        # Differences with the rows of a matrix (or list of ints) measured on a known good harness:
+        # returns (opens, shorts) as lists of (i, j) pairs with i < j
+        opens = []
+        shorts = []
+        for i, row in enumerate(self.rows):
+            reference = expected.rows[i] if isinstance(expected, ContinuityMatrix) else expected[i]
+            missing = reference & ~row & ~((2 << i) - 1)
+            extra = row & ~reference & ~((2 << i) - 1)
+            for pairs, bits in ((opens, missing), (shorts, extra)):
+                while bits:
+                    j = (bits & -bits).bit_length() - 1
+                    bits &= bits - 1
+                    pairs.append((i, j))
+        return opens, shorts
+
+class ContinuityTester:
+    # Drives one test pin low at a time and reads every expander, building a ContinuityMatrix.
+    # A pin is driven by clearing its IODIR bit with its OLAT bit held at 0, so releasing it is
+    # just setting IODIR back to input (the pull-up takes over) and the latch is written once.
+    # Pins in a device's outputs mask (e.g. COM) are not tested and keep their state.
+    #
+    # Steps are ordered by device so that releasing the previous pin and driving the next one
+    # land in the same IODIR write, and a device is driven under the same mux selection as its
+    # mux_groups() group is read with: with disjoint addresses a step costs one write plus one
+    # read per expander and no channel switch at all.
+    def __init__(self, tca, devices):
+        self.tca = tca
+        self.devices = devices  # List of (mux channel, MCP23017) pairs, as returned by TopologyManager
+        self.groups = mux_groups(devices)
+        self.masks = [None] * len(devices)  # Device index -> mux mask of its group
+        for mask, indices in self.groups:
+            for index in indices:
+                self.masks[index] = mask
+        self.pins = []  # (device index, bit) per test pin
+        for index, (channel, mcp) in enumerate(devices):
+            for bit in range(16):
+                if not mcp.outputs >> bit & 1:
+                    self.pins.append((index, bit))
+
+    def select(self, index):
+        if self.masks[index] is not None:
+            self.tca.select_mask(self.masks[index])
+
+    def prepare(self):
+        # Hold OLAT at 0 on every test pin, with all of them still inputs
+        for index, (channel, mcp) in enumerate(self.devices):
+            self.select(index)
+            inputs = 0xFFFF & ~mcp.outputs
+            if not mcp.write_outputs(0x0000, inputs) or not mcp.set_directions(0xFFFF, inputs):
+                return False
+        return True
+
+    def run(self):
+        # Returns the ContinuityMatrix, or None when an expander could not be driven or read
+        start = time.perf_counter()
+        if not self.prepare():
+            return None
+        # Device i's port word sits at bit 16 * i of the concatenated read of all devices
+        test_masks = [0xFFFF & ~mcp.outputs for channel, mcp in self.devices]
+        all_inputs = 0
+        for index, mask in enumerate(test_masks):
+            all_inputs |= mask << (16 * index)
+        # Concatenated bit position -> test pin index, to repack rows into pin order
+        positions = [16 * index + bit for index, bit in self.pins]
+        dense = positions == list(range(len(positions)))
+        rows = []
+        driven = None  # (device index, bit) driven low in the previous step
+        try:
+            for pin, (index, bit) in enumerate(self.pins):
+                mcp = self.devices[index][1]
+                mask = 1 << bit
+                if driven is not None and driven[0] == index:
+                    mask |= 1 << driven[1]  # Release the previous pin in the same write
+                elif driven is not None:
+                    self.release(driven)
+                self.select(index)  # No-op when the mux already points at it
+                driven = (index, bit)
+                if not mcp.set_directions(0xFFFF & ~(1 << bit), mask):
+                    return None
+                words, failed = read_all_gpio(self.tca, self.devices, groups=self.groups)
+                if failed:
+                    return None
+                low = 0
+                for i, word in enumerate(words):
+                    low |= word << (16 * i)
+                low = ~low & all_inputs & ~(1 << positions[pin])
+                if not dense:
+                    low = sum(1 << j for j, position in enumerate(positions) if low >> position & 1)
+                rows.append(low)
+        finally:
+            # Every test pin back to input; free for the pins that already are (shadowed IODIR)
+            for index, mask in enumerate(test_masks):
+                self.select(index)
+                self.devices[index][1].set_directions(0xFFFF, mask)
+        pins = [(self.devices[index][0], self.devices[index][1].address, bit) for index, bit in self.pins]
+        return ContinuityMatrix(pins, rows, time.perf_counter() - start)
+
+    def release(self, driven):
+        index, bit = driven
+        self.select(index)
+        self.devices[index][1].set_directions(0xFFFF, 1 << bit)
@@ -0,0 +1,51 @@
+from array import array
+from collections import deque
+
+DEBOUNCE_SAMPLES = 4  # Consecutive identical samples before a pin's new state is accepted
+
+class Debouncer:
+    # Debounces the port words of all expanders at once. The words of a scan are packed into one
+    # integer (device i at bit 16 * i), so each sample costs a few bitwise operations regardless
+    # of the pin count: a bit goes high once it read high in the last `samples` scans, low once
+    # it read low in all of them, and keeps its stable value otherwise.
+    def __init__(self, samples=DEBOUNCE_SAMPLES):
+        self.samples = max(1, samples)
+        self.history = deque(maxlen=self.samples)
+        self.stable = None  # Packed stable words, None until the first sample
+        self.settled = True  # Every bit agreed over the whole history on the last update
+
+    def reset(self):
+        self.history.clear()
+        self.stable = None
+        self.settled = True
+
+    def update(self, words):
+        # Feed the raw words of one scan, returns True when the stable words changed
+        packed = 0
+        for index, word in enumerate(words):
+            packed |= word << (16 * index)
+        self.history.append(packed)
+        if self.stable is None:
+            self.stable = packed  # First sample is taken as is, there is nothing to compare with
+            self.settled = False
+            return True
+        all_high = any_high = packed
+        for sample in self.history:
+            all_high &= sample
+            any_high |= sample
+        stable = (self.stable | all_high) & any_high
+        self.settled = all_high == any_high and len(self.history) == self.samples
+        changed = stable != self.stable
+        self.stable = stable
+        return changed
+
+    def words(self, count):
+        if self.stable is None:
+            return array('H', [0xFFFF]) * count  # Nothing known yet: nothing pulled to GND
+        return array('H', [(self.stable >> (16 * index)) & 0xFFFF for index in range(count)])
+
+    def word(self, index):
+        # Stable word of one device, 0xFFFF (like read_all_gpio leaves a failed device) before the first sample
+        if self.stable is None:
+            return 0xFFFF
+        return (self.stable >> (16 * index)) & 0xFFFF
@@ -0,0 +1,82 @@
+import tkinter as tk
+from retry import DEFAULT_RETRY_POLICY
+from tracing import TracingBus, TRACE_DUMP_PATH
+
+DIAGNOSTICS_REFRESH_INTERVAL = 1000  # ms between refreshes of the open diagnostics panel
+DIAGNOSTICS_KEY = "<Control-Shift-D>"  # Shows / hides the panel
+
+class DiagnosticsPanel:
+    # Hidden window with the I2C trace statistics of the acquisition worker's bus: per-device
+    # latency, error rate, the retry policy counters and the achieved scan rate and jitter.
+    # Toggled with DIAGNOSTICS_KEY.
+    def __init__(self, master, worker, renderer=None):
+        self.master = master
+        self.worker = worker
+        self.renderer = renderer  # TableRenderer of the app, for the UI frame statistics
+        self.window = None
+        self.text = None
+        self.refresh_job = None
+        master.bind(DIAGNOSTICS_KEY, self.toggle)
+
+    def toggle(self, event=None):
+        if self.window is None:
+            self.show()
+        else:
+            self.hide()
+
+    def show(self):
+        self.window = tk.Toplevel(self.master)
+        self.window.title("I2C diagnostics")
+        self.window.configure(bg="#1E1E1E")
+        self.window.protocol("WM_DELETE_WINDOW", self.hide)
+        self.text = tk.Text(self.window, width=80, height=24, bg="#1E1E1E", fg="white", font=("Courier", 11))
+        self.text.pack(fill=tk.BOTH, expand=True)
+        buttons = tk.Frame(self.window, bg="#1E1E1E")
+        buttons.pack(fill=tk.X)
+        tk.Button(buttons, text="Dump", command=self.dump, bg="#4CAF50", fg="white", font=("Arial", 12)).pack(side=tk.LEFT, padx=5, pady=5)
+        tk.Button(buttons, text="Reset", command=self.reset, bg="#F44336", fg="white", font=("Arial", 12)).pack(side=tk.LEFT, padx=5, pady=5)
+        self.refresh()
+
+    def hide(self):
+        if self.refresh_job is not None:
+            self.master.after_cancel(self.refresh_job)
+            self.refresh_job = None
+        if self.window is not None:
+            self.window.destroy()
+        self.window = None
+        self.text = None
+
+    def trace(self):
+        bus = self.worker.bus if self.worker is not None else None
+        return bus if isinstance(bus, TracingBus) else None
+
+    def refresh(self):
+        trace = self.trace()
+        if trace is None:
+            report = "I2C tracing is off (HARNESS_I2C_TRACE=0) or the bus is not open."
+        else:
+            report = trace.report()
+        stats = DEFAULT_RETRY_POLICY.stats()
+        unhealthy = ", ".join(f"{channel}/{address:#x}" for channel, address in stats.pop("unhealthy")) or "none"
+        report += "\n\nRetries: " + ", ".join(f"{name} {count}" for name, count in stats.items())
+        report += f"\nUnhealthy devices: {unhealthy}"
+        scheduler = getattr(self.worker, "scheduler", None)  # The scanner service keeps its own
+        if scheduler is not None:
+            report += "\n" + scheduler.report()
+        if self.renderer is not None:
+            s = self.renderer.stats()
+            report += (f"\nUI: {s['fps']:.0f} fps, {s['pending']} row(s) pending, "
+                       f"{s['overruns']} of {s['frames']} frames over budget")
+        self.text.delete("1.0", tk.END)
+        self.text.insert(tk.END, report)
+        self.refresh_job = self.master.after(DIAGNOSTICS_REFRESH_INTERVAL, self.refresh)
+
+    def dump(self):
+        trace = self.trace()
+        if trace is not None and trace.dump(TRACE_DUMP_PATH):
+            print(f"I2C trace written to {TRACE_DUMP_PATH}")
+
+    def reset(self):
+        trace = self.trace()
+        if trace is not None:
+            trace.reset()
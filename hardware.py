@@ -1,5 +1,6 @@
-import smbus2
 import time
+from array import array
+from retry import DEFAULT_RETRY_POLICY
 
 # Constants for I2C addresses
 TCA9548A_ADDR = 0x70  # Default I2C address for TCA9548A
@@ -8,141 +9,353 @@ MCP23017_ADDR_BASE = 0x20  # Base I2C address for MCP23017
 # I2C bus number (usually 1 for Raspberry Pi)
 I2C_BUS = 1
 RETRY_COUNT = 5
-RETRY_DELAY = 0.5  # Increased delay in seconds between retries
-CONFIG_DELAY = 1   # Delay after configuring MCP23017
 SCAN_DELAY = 10    # Delay in seconds between each scan cycle
+MUX_VERIFY_EVERY = 8  # Read the TCA9548A channel mask back on every Nth switch (1 = always, 0 = never)
 
 class TCA9548A:
-    def __init__(self, bus, address=0x70):
+    def __init__(self, bus, address=0x70, verify_every=MUX_VERIFY_EVERY, retry=None):
         self.bus = bus
         self.address = address
+        self.retry = retry or DEFAULT_RETRY_POLICY
+        self.key = (None, address)  # Retry policy / circuit breaker key
+        self.verify_every = verify_every
+        self.mask = None  # Channel mask currently selected on the mux, None when unknown
+        self.switches = 0
+
+    def select_channel(self, channel):
+        if not self.select_mask(1 << channel):
+            print(f"Failed to select channel {channel} after retries.")
+
+    def select_mask(self, mask):
+        if mask == self.mask:
+            return True  # Already selected, no bus traffic
+        for attempt in self.retry.attempts(self.key):
+            try:
+                self.bus.write_byte(self.address, mask)
+                self.switches += 1
+                if self.verify_every and self.switches % self.verify_every == 0:
+                    selected = self.bus.read_byte(self.address)
+                    if selected != mask:
+                        self.mask = None
+                        continue
+                self.mask = mask
+                self.retry.success(self.key)
+                return True
+            except OSError as e:
+                self.mask = None
+        return False
+
+    def invalidate(self):
+        # Forget the tracked selection so the next select writes the mux again,
+        # e.g. after a device behind it stopped answering
+        self.mask = None
 
     def select_all_channels(self):
-        for attempt in range(RETRY_COUNT):
+        for attempt in self.retry.attempts(self.key):
             try:
                 self.bus.write_byte(self.address, 0xFF)  # Enable all channels
                 selected = self.bus.read_byte(self.address)
                 if selected == 0xFF:
+                    self.mask = 0xFF
+                    self.retry.success(self.key)
                     print("All channels selected.")
                     return
                 else:
                     print(f"Attempt {attempt + 1}: Failed to select all channels. Selected: {selected:#04x}")
             except OSError as e:
                 print(f"Attempt {attempt + 1}: Error selecting all channels: {e}")
-            time.sleep(RETRY_DELAY)
+            self.mask = None
 
         print("Failed to select all channels after retries.")
 
 class MCP23017:
-    def __init__(self, bus, address):
+    def __init__(self, bus, address, outputs=0x0000, channel=None, retry=None):
         self.bus = bus
         self.address = address
+        self.outputs = outputs  # Pins driven as outputs (bits 0-7 = A0-A7, bits 8-15 = B0-B7)
+        self.channel = channel  # Mux channel the device sits behind, None without a mux
+        self.retry = retry or DEFAULT_RETRY_POLICY
+        self.key = (channel, address)  # Retry policy / circuit breaker key
+        # Shadow copies of IODIR, GPPU and OLAT as 16-bit words (A | B << 8), None when unknown.
+        # Writes are applied here first and only the ports whose value changed go on the bus.
+        self.iodir = None
+        self.gppu = None
+        self.olat = None
 
     def configure_as_inputs_with_pullups(self):
-        for attempt in range(RETRY_COUNT):
+        iodir_a = 0xFF & ~self.outputs
+        iodir_b = 0xFF & ~(self.outputs >> 8)
+        self.iodir = self.gppu = self.olat = None
+        for attempt in self.retry.attempts(self.key):
             try:
-                # Set all pins on both GPIOA and GPIOB as inputs (IODIRA and IODIRB)
-                self.bus.write_byte_data(self.address, 0x00, 0xFF)  # IODIRA register
-                self.bus.write_byte_data(self.address, 0x01, 0xFF)  # IODIRB register
+                # BANK=0 and SEQOP=0 so GPIOA/GPIOB can be burst-read in one transaction
+                self.bus.write_byte_data(self.address, 0x0A, 0x00)  # IOCON register
+                # Set all pins on both GPIOA and GPIOB as inputs, except the ones used as outputs
+                self.bus.write_i2c_block_data(self.address, 0x00, [iodir_a, iodir_b])  # IODIRA/B registers
                 # Enable pull-up resistors on all pins (GPPUA and GPPUB)
-                self.bus.write_byte_data(self.address, 0x0C, 0xFF)  # GPPUA register
-                self.bus.write_byte_data(self.address, 0x0D, 0xFF)  # GPPUB register
+                self.bus.write_i2c_block_data(self.address, 0x0C, [0xFF, 0xFF])  # GPPUA/B registers
 
-                # Verify configuration
-                iodira = self.bus.read_byte_data(self.address, 0x00)
-                iodirb = self.bus.read_byte_data(self.address, 0x01)
-                gppua = self.bus.read_byte_data(self.address, 0x0C)
-                gppub = self.bus.read_byte_data(self.address, 0x0D)
+                # Verify configuration, and load the output latches into the shadow copy
+                iodira, iodirb = self.bus.read_i2c_block_data(self.address, 0x00, 2)
+                gppua, gppub = self.bus.read_i2c_block_data(self.address, 0x0C, 2)
+                olata, olatb = self.bus.read_i2c_block_data(self.address, 0x14, 2)
 
-                if iodira == 0xFF and iodirb == 0xFF and gppua == 0xFF and gppub == 0xFF:
+                if iodira == iodir_a and iodirb == iodir_b and gppua == 0xFF and gppub == 0xFF:
                     print(f"Configured IODIRA: {iodira:#04x}, IODIRB: {iodirb:#04x}")
                     print(f"Configured GPPUA: {gppua:#04x}, GPPUB: {gppub:#04x}")
+                    self.iodir = iodira | (iodirb << 8)
+                    self.gppu = gppua | (gppub << 8)
+                    self.olat = olata | (olatb << 8)
+                    self.retry.success(self.key)
                     return
                 else:
                     print(f"Attempt {attempt + 1}: Failed to configure MCP23017 at address {self.address:#02x}")
 
             except OSError as e:
                 print(f"Attempt {attempt + 1}: Error configuring MCP23017 at address {self.address:#02x}: {e}")
-            time.sleep(RETRY_DELAY)
 
         print(f"Failed to configure MCP23017 at address {self.address:#02x} after retries.")
 
     def is_connected(self):
-        for attempt in range(RETRY_COUNT):
+        for attempt in self.retry.attempts(self.key):
             try:
                 # Attempt to read IODIRA register (0x00)
                 self.bus.read_byte_data(self.address, 0x00)
+                self.retry.success(self.key)
                 return True
             except OSError:
-                time.sleep(RETRY_DELAY)
+                pass
         return False
 
-    def read_gpio(self):
-        for attempt in range(RETRY_COUNT):
+    def probe(self):
+        # Single attempt, no retry delay: used to check cached topologies quickly
+        try:
+            self.bus.read_byte_data(self.address, 0x00)
+            return True
+        except OSError:
+            return False
+
+    def read_gpio_word(self):
+        for attempt in self.retry.attempts(self.key):
             try:
-                gpioa = self.bus.read_byte_data(self.address, 0x12)  # GPIOA register
-                gpiob = self.bus.read_byte_data(self.address, 0x13)  # GPIOB register
-                return gpioa, gpiob
+                # GPIOA and GPIOB in one sequential read, returned as GPIOA | GPIOB << 8
+                gpioa, gpiob = self.bus.read_i2c_block_data(self.address, 0x12, 2)
+                self.retry.success(self.key)
+                return gpioa | (gpiob << 8)
             except OSError as e:
                 print(f"Attempt {attempt + 1}: Error reading GPIO from MCP23017 at address {self.address:#02x}: {e}")
-                time.sleep(RETRY_DELAY)
-        return None, None
+        return None
 
-    def write_gpio(self, port, value):
-        reg = 0x14 if port == 'A' else 0x15  # OLATA or OLATB
-        for attempt in range(RETRY_COUNT):
+    def read_ports(self, ports):
+        # ports: 1 = GPIOA, 2 = GPIOB, 3 = both. Ports not read are returned as 0xFF (nothing pulled to GND)
+        if ports == 3:
+            return self.read_gpio_word()
+        reg = 0x12 if ports == 1 else 0x13  # GPIOA or GPIOB
+        for attempt in self.retry.attempts(self.key):
+            try:
+                value = self.bus.read_byte_data(self.address, reg)
+                self.retry.success(self.key)
+                return value | 0xFF00 if ports == 1 else 0x00FF | (value << 8)
+            except OSError as e:
+                print(f"Attempt {attempt + 1}: Error reading GPIO from MCP23017 at address {self.address:#02x}: {e}")
+        return None
+
+    def read_gpio(self):
+        word = self.read_gpio_word()
+        if word is None:
+            return None, None
+        return word & 0xFF, word >> 8
+
+    def configure_interrupts(self):
+        inputs = 0xFFFF & ~self.outputs
+        for attempt in self.retry.attempts(self.key):
+            try:
+                # MIRROR=1 (INTA and INTB are OR'ed together), ODR=1 (open-drain, active low)
+                self.bus.write_byte_data(self.address, 0x0A, 0x44)  # IOCON register
+                # GPINTENA/B, DEFVALA/B, INTCONA/B in one sequential write:
+                # interrupt on any change of an input pin, compared against its previous value
+                self.bus.write_i2c_block_data(self.address, 0x04, [inputs & 0xFF, inputs >> 8, 0x00, 0x00, 0x00, 0x00])
+                self.retry.success(self.key)
+                return True
+            except OSError as e:
+                print(f"Attempt {attempt + 1}: Error configuring interrupts on MCP23017 at address {self.address:#02x}: {e}")
+        return False
+
+    def disable_interrupts(self):
+        for attempt in self.retry.attempts(self.key):
+            try:
+                self.bus.write_i2c_block_data(self.address, 0x04, [0x00, 0x00])  # GPINTENA/B
+                self.retry.success(self.key)
+                return True
+            except OSError as e:
+                print(f"Attempt {attempt + 1}: Error disabling interrupts on MCP23017 at address {self.address:#02x}: {e}")
+        return False
+
+    def read_interrupt(self):
+        for attempt in self.retry.attempts(self.key):
             try:
-                self.bus.write_byte_data(self.address, reg, value)
+                # INTFA/B, INTCAPA/B and GPIOA/B in one sequential read; reading GPIO clears the interrupt.
+                # Returns (flags, captured, current) as 16-bit words.
+                intfa, intfb, intcapa, intcapb, gpioa, gpiob = self.bus.read_i2c_block_data(self.address, 0x0E, 6)
+                self.retry.success(self.key)
+                return intfa | (intfb << 8), intcapa | (intcapb << 8), gpioa | (gpiob << 8)
+            except OSError as e:
+                print(f"Attempt {attempt + 1}: Error reading interrupt state from MCP23017 at address {self.address:#02x}: {e}")
+        return None
+
+    def update_register(self, reg, name, value, mask=0xFFFF):
+        # Set the bits of mask in the 16-bit register pair at reg (IODIR 0x00, GPPU 0x0C, OLAT 0x14)
+        # to value, using the shadow copy in attribute name. Both ports changing is one block
+        # write, one port a single byte write, and nothing changing costs no transaction.
+        current = getattr(self, name)
+        for attempt in self.retry.attempts(self.key):
+            try:
+                if current is None:
+                    low, high = self.bus.read_i2c_block_data(self.address, reg, 2)
+                    current = low | (high << 8)
+                    setattr(self, name, current)
+                new = (current & ~mask) | (value & mask)
+                changed = current ^ new
+                if changed & 0x00FF and changed & 0xFF00:
+                    self.bus.write_i2c_block_data(self.address, reg, [new & 0xFF, new >> 8])
+                elif changed & 0x00FF:
+                    self.bus.write_byte_data(self.address, reg, new & 0xFF)
+                elif changed:
+                    self.bus.write_byte_data(self.address, reg + 1, new >> 8)
+                setattr(self, name, new)
+                self.retry.success(self.key)
                 return True
             except OSError as e:
-                print(f"Attempt {attempt + 1}: Error writing GPIO to MCP23017 at address {self.address:#02x}: {e}")
-                time.sleep(RETRY_DELAY)
+                current = None  # The write may or may not have landed, read the register back
+                setattr(self, name, None)
+                print(f"Attempt {attempt + 1}: Error writing register {reg:#04x} of MCP23017 at address {self.address:#02x}: {e}")
         return False
 
+    def write_outputs(self, value, mask=0xFFFF):
+        # Drive several output pins at once: one OLAT write at most
+        return self.update_register(0x14, "olat", value, mask)
+
+    def set_directions(self, iodir, mask=0xFFFF):
+        # 1 = input, 0 = output, like IODIR
+        return self.update_register(0x00, "iodir", iodir, mask)
+
+    def set_pullups(self, gppu, mask=0xFFFF):
+        return self.update_register(0x0C, "gppu", gppu, mask)
+
+    def write_gpio(self, port, value):
+        if port == 'A':
+            return self.write_outputs(value, 0x00FF)  # OLATA
+        return self.write_outputs(value << 8, 0xFF00)  # OLATB
+
+    def write_pin_high(self, pin):
+        return self.write_outputs(0xFFFF, 1 << pin)
+
+    def write_pin_low(self, pin):
+        return self.write_outputs(0x0000, 1 << pin)
+
+def mux_groups(devices):
+    # Group the mux channels of (channel, MCP23017) pairs so that the channels of a group can be
+    # enabled together: no two expanders of a group share an address. Returns (mask, device
+    # indices) pairs for read_all_gpio; devices without a mux channel form a group with mask None.
+    channels = {}  # channel -> indices of its devices
+    for index, (channel, mcp) in enumerate(devices):
+        channels.setdefault(channel, []).append(index)
+    groups = []  # [mask, addresses, indices]
+    if None in channels:
+        groups.append([None, set(), channels.pop(None)])
+    for channel in sorted(channels):
+        addresses = {devices[index][1].address for index in channels[channel]}
+        for group in groups:
+            if group[0] is not None and not group[1] & addresses:
+                break
+        else:
+            group = [0, set(), []]
+            groups.append(group)
+        group[0] |= 1 << channel
+        group[1] |= addresses
+        group[2].extend(channels[channel])
+    return [(mask, tuple(indices)) for mask, addresses, indices in groups]
+
+def read_all_gpio(tca, devices, ports=None, groups=None):
+    # Read every (channel, MCP23017) pair, one mux selection per group of channels (see
+    # mux_groups; without groups every channel is its own group). The group the mux already
+    # points at is read first, so an unchanged selection costs no mux write at all.
+    # Returns one 16-bit port word per device (in the order of devices) and the indices of the
+    # devices that failed (their word is left at 0xFFFF, i.e. nothing pulled to GND).
+    # ports optionally restricts the scan (see scan_plan): ports[i] is 0 to skip devices[i],
+    # otherwise the read_ports() selection.
+    words = array('H', [0xFFFF]) * len(devices)
+    failed = []
+    if groups is None:
+        groups = [(None if channel is None else 1 << channel, (index,))
+                  for index, (channel, mcp) in enumerate(devices)]
+    for mask, indices in sorted(groups, key=lambda group: (group[0] != tca.mask, group[0] or 0)):
+        if ports is not None:
+            indices = [index for index in indices if ports[index]]
+            if not indices:
+                continue
+        if mask is not None and not tca.select_mask(mask):
+            # The mux may still point at another group, whose expanders can share these
+            # addresses: reading now would report their pins as this group's
+            failed.extend(indices)
+            tca.invalidate()
+            continue
+        for index in indices:
+            mcp = devices[index][1]
+            skipped = mcp.retry.skipping(mcp.key)
+            word = mcp.read_gpio_word() if ports is None else mcp.read_ports(ports[index])
+            if word is None:
+                failed.append(index)
+                if not skipped:
+                    tca.invalidate()  # A failed transaction may have left the mux in a bad state
+            else:
+                words[index] = word
+    return words, failed
+
 def main():
+    from bus import open_bus
+    from topology import TopologyManager
+
     try:
-        bus = smbus2.SMBus(I2C_BUS)
+        bus = open_bus(I2C_BUS)
     except FileNotFoundError as e:
         print(f"Error: Could not open I2C bus: {e}")
         return
 
     tca = TCA9548A(bus, TCA9548A_ADDR)
     tca.select_all_channels()  # Enable all channels at once
-    mcp_addresses = [MCP23017_ADDR_BASE + i for i in range(8)]  # Possible addresses for MCP23017
+    # Possible addresses for MCP23017, discovered once and cached between runs
+    candidates = [(None, MCP23017_ADDR_BASE + i) for i in range(8)]
+    topology = TopologyManager(bus, tca, fixture_id="all-channels", candidates=candidates)
+    devices = topology.load()
 
     try:
         while True:
-            connected_devices = []
-
-            for addr in mcp_addresses:
-                mcp = MCP23017(bus, addr)
-                if mcp.is_connected():
-                    connected_devices.append(addr)
-                    print(f"Found MCP23017 at address 0x{addr:02X}")
-                    mcp.configure_as_inputs_with_pullups()  # Ensure proper configuration
-                    time.sleep(CONFIG_DELAY)  # Add delay after configuration
-
             print("\nSummary of connected MCP23017 devices:")
-            for addr in connected_devices:
+            words, failed = read_all_gpio(tca, devices)
+            for index, (channel, mcp) in enumerate(devices):
+                addr = mcp.address
                 print(f"MCP23017 at address 0x{addr:02X}")
-                mcp = MCP23017(bus, addr)
-                mcp.configure_as_inputs_with_pullups()  # Reconfigure before reading
-                time.sleep(CONFIG_DELAY)  # Add delay before reading
-                gpioa, gpiob = mcp.read_gpio()
-                if gpioa is not None and gpiob is not None:
-                    print(f"  Raw GPIOA: {gpioa:#04x}, Raw GPIOB: {gpiob:#04x}")
-                    for pin in range(8):
-                        if not (gpioa & (1 << pin)):  # Check each pin of GPIOA
-                            print(f"  GND detected at pin A{pin} in MCP23017 at address 0x{addr:02X}.")
-                    for pin in range(8):
-                        if not (gpiob & (1 << pin)):  # Check each pin of GPIOB
-                            print(f"  GND detected at pin B{pin} in MCP23017 at address 0x{addr:02X}.")
-
-                    # Example write operation to GPIOA
-                    if mcp.write_gpio('A', 0xFF):
-                        print(f"  Successfully wrote to GPIOA in MCP23017 at address 0x{addr:02X}.")
-                    else:
-                        print(f"  Failed to write to GPIOA in MCP23017 at address 0x{addr:02X}.")
+                if index in failed:
+                    continue
+                gpioa, gpiob = words[index] & 0xFF, words[index] >> 8
+                print(f"  Raw GPIOA: {gpioa:#04x}, Raw GPIOB: {gpiob:#04x}")
+                for pin in range(8):
+                    if not (gpioa & (1 << pin)):  # Check each pin of GPIOA
+                        print(f"  GND detected at pin A{pin} in MCP23017 at address 0x{addr:02X}.")
+                for pin in range(8):
+                    if not (gpiob & (1 << pin)):  # Check each pin of GPIOB
+                        print(f"  GND detected at pin B{pin} in MCP23017 at address 0x{addr:02X}.")
+
+                # Example write operation to GPIOA
+                if mcp.write_gpio('A', 0xFF):
+                    print(f"  Successfully wrote to GPIOA in MCP23017 at address 0x{addr:02X}.")
+                else:
+                    print(f"  Failed to write to GPIOA in MCP23017 at address 0x{addr:02X}.")
+
+            if failed:
+                # Only go back to probing when a known device stopped answering
+                devices = topology.rediscover()
 
             time.sleep(SCAN_DELAY)  # Delay between scans to avoid overwhelming the I2C bus
 
@@ -0,0 +1,31 @@
+from PIL import Image, ImageTk
+
+SWITCH_IMAGE_SIZE = (100, 65)
+
+_images = {}  # (path, size) -> decoded and resized PIL image, shared by the whole process
+_photos = {}  # (path, size) -> ImageTk.PhotoImage for the current Tk interpreter
+_photos_tk = None  # Tk interpreter the cached PhotoImages belong to
+
+def load_image(path, size):
+    key = (path, size)
+    image = _images.get(key)
+    if image is None:
+        with Image.open(path) as source:
+            # Decode once and keep a plain RGB copy so the file handle is released
+            image = source.convert("RGB").resize(size, Image.LANCZOS)
+        _images[key] = image
+    return image
+
+def get_photo(path, size, master):
+    # PhotoImages are tied to the Tk interpreter that created them, so they are rebuilt from the
+    # cached PIL images when the app is restarted with a new root (e.g. after logout)
+    global _photos_tk
+    if master.tk is not _photos_tk:
+        _photos.clear()
+        _photos_tk = master.tk
+    key = (path, size)
+    photo = _photos.get(key)
+    if photo is None:
+        photo = ImageTk.PhotoImage(load_image(path, size), master=master)
+        _photos[key] = photo
+    return photo
@@ -0,0 +1,60 @@
+import threading
+from hardware import RETRY_COUNT
+
+class InterruptMonitor:
+    # Event-driven pin-change detection: every MCP23017 has its mirrored INT output wired to a
+    # Raspberry Pi GPIO, and only the expanders on the line that fired are read.
+    # gpio is the RPi.GPIO module (or any object with the same API), so a fake can be passed in.
+    def __init__(self, gpio, tca, lines, on_change, lock=None, callback=None):
+        self.gpio = gpio
+        self.tca = tca
+        self.lines = lines  # BCM pin -> list of (mux channel, MCP23017) whose INT output is wired to it
+        self.on_change = on_change  # Called as on_change(channel, mcp, flags, captured, current)
+        self.lock = lock or threading.Lock()  # Serializes bus access with the rest of the app
+        # Edge callback registered with GPIO; defaults to reading the expanders right away on the
+        # RPi.GPIO thread, but can forward the pin to whichever thread owns the bus instead
+        self.callback = callback or self.handle_interrupt
+        self.running = False
+
+    def start(self):
+        with self.lock:
+            for devices in self.lines.values():
+                for channel, mcp in devices:
+                    self.select(channel)
+                    mcp.configure_interrupts()
+                    mcp.read_interrupt()  # Clear anything latched before we start listening
+        for pin in self.lines:
+            self.gpio.setup(pin, self.gpio.IN, pull_up_down=self.gpio.PUD_UP)
+            self.gpio.add_event_detect(pin, self.gpio.FALLING, callback=self.callback)
+        self.running = True
+
+    def stop(self):
+        for pin in self.lines:
+            self.gpio.remove_event_detect(pin)
+        with self.lock:
+            for devices in self.lines.values():
+                for channel, mcp in devices:
+                    self.select(channel)
+                    mcp.disable_interrupts()
+        self.running = False
+
+    def select(self, channel):
+        if channel is not None:
+            self.tca.select_channel(channel)
+
+    def handle_interrupt(self, pin):
+        # Runs on the RPi.GPIO callback thread
+        devices = self.lines.get(pin, ())
+        with self.lock:
+            for attempt in range(RETRY_COUNT):
+                for channel, mcp in devices:
+                    self.select(channel)
+                    state = mcp.read_interrupt()
+                    if state is None:
+                        continue
+                    flags, captured, current = state
+                    if flags:
+                        self.on_change(channel, mcp, flags, captured, current)
+                # INT is active low: if it is still asserted, a pin changed again while we were reading
+                if self.gpio.input(pin) or not self.running:
+                    break
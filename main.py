@@ -1,10 +1,14 @@
 import tkinter as tk
 from tkinter import ttk
-from PIL import Image, ImageTk
-import smbus2
+from image_cache import get_photo, SWITCH_IMAGE_SIZE
+from reference import CONDITION_NAMES
+from bus import open_bus
 from hardware import TCA9548A
 from hardware import MCP23017
 
+SWITCH_ON_IMAGE = "closed.jpg"
+SWITCH_OFF_IMAGE = "open.jpg"
+
 class PatternInfoExtractorApp:
     # Define user credentials
     USERS = {
@@ -22,8 +26,6 @@ class PatternInfoExtractorApp:
     COM_PIN = -1
     GND_PINS = list(range(16))  # MCP23017 has 16 pins, indexed 0-15
     
-    bus = smbus2.SMBus(I2C_BUS)
-    
     def __init__(self, master):
         self.master = master
         self.on_image_tk = None  # Define on_image_tk attribute
@@ -34,6 +36,8 @@ class PatternInfoExtractorApp:
         self.logged_in_user_label = tk.Label(self.master, text="", bg="#1E1E1E", fg="white", font=("Arial", 12))
         self.logged_in_user_label.pack(anchor=tk.W, padx=0, pady=(0, 0))
         self.create_login_ui()
+        # Opened here rather than at class definition so the module can be imported without I2C
+        self.bus = open_bus(self.I2C_BUS)
         self.TCA = TCA9548A(self.bus)
         self.MCP = MCP23017(self.bus, self.MCP_ADDRESS)  # Pass the address directly
 
@@ -76,6 +80,9 @@ class PatternInfoExtractorApp:
         self.login_error_label.grid(row=3, columnspan=2, padx=5, pady=5)
 
     def create_main_ui(self):
+        # Switch images are decoded once and shared by every row
+        self.on_image_tk = get_photo(SWITCH_ON_IMAGE, SWITCH_IMAGE_SIZE, self.master)
+        self.off_image_tk = get_photo(SWITCH_OFF_IMAGE, SWITCH_IMAGE_SIZE, self.master)
         self.master.geometry("1000x700")
         self.master.title("Pattern Info Extractor")
         self.main_frame = tk.Frame(self.master, bg="#1E1E1E")
@@ -139,18 +146,6 @@ class PatternInfoExtractorApp:
             switch_state = tk.BooleanVar()
             switch_state.set(False)  # Set initial state
 
-            # Load images for switches
-            on_image = Image.open("closed.jpg")
-            off_image = Image.open("open.jpg")
-
-            # Resize images
-            on_image = on_image.resize((100, 65), Image.LANCZOS)
-            off_image = off_image.resize((100, 65), Image.LANCZOS)
-
-            # Convert images to tkinter compatible format
-            self.on_image_tk = ImageTk.PhotoImage(on_image)
-            self.off_image_tk = ImageTk.PhotoImage(off_image)
-
             switch = tk.Label(self.table_container, image=self.off_image_tk, bg="#1E1E1E")
             switch.grid(row=row_index, column=2, padx=5, pady=5)
 
@@ -201,19 +196,7 @@ class PatternInfoExtractorApp:
         switch.config(image=self.off_image_tk)  # Update switch to show LED is OFF
 
     def get_condition_name(self, code):
-        # Map condition codes to full names
-        condition_map = {
-            "Lo": "Locking",
-            "Co": "Coding",
-            "Sl": "Seclock",
-            "Cl": "Clips",
-            "Cp": "Cpa",
-            "Cv": "Cover",
-            "Se": "Seal",
-            "La": "Latch",
-            "Ad": "Additional Part"
-        }
-        return condition_map.get(code, "Unknown")
+        return CONDITION_NAMES.get(code, "Unknown")
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,194 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from acquisition import (DeviceInfo, SnapshotPublisher, scan_rate, IDLE_WAIT, SNAPSHOT_QUEUE_SIZE,
+                         REPROBE_AFTER_FAILED_SCANS, RECOVER_INTERVAL)
+from debounce import Debouncer, DEBOUNCE_SAMPLES
+from hardware import TCA9548A, read_all_gpio, mux_groups
+from retry import RetryPolicy
+from scheduler import CycleScheduler
+from topology import TopologyManager, FIXTURE_ID
+
+# I2C buses of the station, e.g. HARNESS_I2C_BUSES=1,3 for a second harness tree on /dev/i2c-3
+DEFAULT_I2C_BUSES = (1,)
+CHANNELS_PER_BUS = 8  # TCA9548A channels; bus k's devices get virtual channels 8 * k .. 8 * k + 7
+
+def i2c_buses():
+    # Read when an engine is created rather than at import, so a bad value can't stop the apps
+    value = os.environ.get("HARNESS_I2C_BUSES")
+    if value is None:
+        return list(DEFAULT_I2C_BUSES)
+    try:
+        return [int(n) for n in value.split(",")]
+    except ValueError:
+        print(f"Invalid HARNESS_I2C_BUSES {value!r}, using bus {','.join(str(n) for n in DEFAULT_I2C_BUSES)}.")
+        return list(DEFAULT_I2C_BUSES)
+
+class BusScanner:
+    # One I2C bus with its mux and expanders. Every call runs on the bus's own single-thread
+    # executor, so transactions on one bus stay serialized while other buses proceed in parallel.
+    def __init__(self, index, bus_number, open_bus, outputs=None, fixture_id=FIXTURE_ID):
+        self.index = index
+        self.bus_number = bus_number
+        self.open_bus = open_bus  # Called with the bus number on the executor thread
+        self.outputs = outputs or {}
+        self.fixture_id = f"{fixture_id}-bus{bus_number}"  # Each tree has its own cached topology
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"i2c-{bus_number}")
+        self.bus = None
+        self.tca = None
+        self.topology = None
+        self.devices = []  # (mux channel, MCP23017) pairs
+        self.groups = None  # mux_groups() of devices
+        self.retry = RetryPolicy()  # Per bus: (channel, address) keys repeat on every bus
+        self.failed_scans = 0
+        self.next_recover = 0.0  # monotonic time of the next TopologyManager.recover()
+
+    def setup(self):
+        self.bus = self.open_bus(self.bus_number)
+        self.tca = TCA9548A(self.bus, retry=self.retry)
+        self.topology = TopologyManager(self.bus, self.tca, self.fixture_id, outputs=self.outputs, retry=self.retry)
+        self.devices = self.topology.load()
+        self.groups = mux_groups(self.devices)
+
+    def device_info(self):
+        # Devices with their virtual channel, so logical pin numbers don't collide across buses
+        return tuple(DeviceInfo(self.index * CHANNELS_PER_BUS + (channel or 0), mcp.address, mcp.outputs)
+                     for channel, mcp in self.devices)
+
+    def scan(self):
+        words, failed = read_all_gpio(self.tca, self.devices, groups=self.groups)
+        self.failed_scans = self.failed_scans + 1 if failed else 0
+        devices = None
+        if self.failed_scans >= REPROBE_AFTER_FAILED_SCANS:
+            self.failed_scans = 0
+            devices = self.topology.rediscover()
+        elif self.topology.missing and time.monotonic() >= self.next_recover:
+            self.next_recover = time.monotonic() + RECOVER_INTERVAL
+            devices = self.topology.recover()
+        if devices is not None:
+            self.devices = devices
+            self.groups = mux_groups(self.devices)
+        return words, failed, devices is not None
+
+    def write_pin(self, address, pin, high):
+        for channel, mcp in self.devices:
+            if mcp.address == address:
+                if channel is not None:
+                    self.tca.select_channel(channel)
+                mcp.write_outputs(0xFFFF if high else 0x0000, 1 << pin)
+                return
+        print(f"MCP23017 at address {address:#02x} not found on bus {self.bus_number}.")
+
+    def close(self):
+        if self.bus is not None:
+            self.bus.close()
+
+class MultiBusEngine(SnapshotPublisher, threading.Thread):
+    # Acquisition over several I2C buses: an asyncio loop on this thread starts one scan per bus
+    # on the buses' executors, waits for all of them and merges the results into one snapshot,
+    # so a scan takes as long as the slowest bus instead of the sum of all of them.
+    # Same interface as AcquisitionWorker (snapshots, latest_snapshot, start/stop_scanning,
+    # write_pin, stop), so the apps and the scanner service can use either.
+    def __init__(self, open_bus, buses=None, outputs=None, interval=None, fixture_id=FIXTURE_ID,
+                 debounce=DEBOUNCE_SAMPLES):
+        super().__init__(daemon=True)
+        # outputs (the COM driver) only apply to the first bus
+        self.outputs = outputs or {}
+        self.scanners = [BusScanner(index, bus_number, open_bus, outputs if index == 0 else None, fixture_id)
+                         for index, bus_number in enumerate(buses or i2c_buses())]
+        self.scheduler = CycleScheduler(interval or 1.0 / scan_rate())  # Scan timing, achieved rate and jitter
+        self.snapshots = queue.Queue(maxsize=SNAPSHOT_QUEUE_SIZE)
+        self.scanning = threading.Event()
+        self.stopped = threading.Event()
+        self.debouncer = Debouncer(debounce)
+        self.bus = None  # No single bus to trace
+        self.devices = ()
+        self.words = array('H')
+        self.failed = ()
+        self.sequence = 0
+        self.scans = 0
+        self.restart = False  # Set by start_scanning, the debouncer is reset on the loop thread
+        self.setups = []
+
+    def start(self):
+        # Bus setup is queued before anything else can reach the executors (e.g. write_pin)
+        self.setups = [scanner.executor.submit(scanner.setup) for scanner in self.scanners]
+        super().start()
+
+    def run(self):
+        asyncio.run(self.main())
+
+    async def main(self):
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*(asyncio.wrap_future(setup) for setup in self.setups), return_exceptions=True)
+        for scanner, result in zip(list(self.scanners), results):
+            if isinstance(result, Exception):
+                print(f"Error: Could not open I2C bus {scanner.bus_number}: {result}")
+                self.scanners.remove(scanner)
+        self.set_devices()
+        try:
+            was_scanning = False
+            while not self.stopped.is_set():
+                scanning = self.scanning.is_set()
+                if scanning and not was_scanning:
+                    self.scheduler.reset()  # Resume on a fresh deadline instead of counting the pause as lateness
+                was_scanning = scanning
+                if scanning and self.scheduler.due():
+                    self.scheduler.tick()
+                    await self.scan()
+                await asyncio.sleep(self.scheduler.delay() if scanning else IDLE_WAIT)
+        finally:
+            for scanner in self.scanners:
+                await loop.run_in_executor(scanner.executor, scanner.close)
+                scanner.executor.shutdown()
+
+    def set_devices(self):
+        self.devices = tuple(device for scanner in self.scanners for device in scanner.device_info())
+        self.debouncer.reset()
+
+    async def scan(self):
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*(loop.run_in_executor(scanner.executor, scanner.scan)
+                                         for scanner in self.scanners))
+        if any(rediscovered for words, failed, rediscovered in results):
+            self.set_devices()
+            return
+        words = array('H')
+        failed = []
+        for bus_words, bus_failed, rediscovered in results:
+            failed.extend(len(words) + index for index in bus_failed)
+            words.extend(bus_words)
+        self.scans += 1
+        if self.restart:
+            self.restart = False
+            self.debouncer.reset()  # The first scan is published as is
+        self.sample(words, failed)
+
+    def write_pin(self, address, pin, high, bus=None):
+        # bus is the I2C bus number, the first bus by default (the COM driver lives there)
+        for scanner in self.scanners:
+            if bus is None or scanner.bus_number == bus:
+                scanner.executor.submit(scanner.write_pin, address, pin, high)
+                return
+
+    def set_reference(self, reference):
+        pass  # Always a full sweep: every bus is read in parallel anyway
+
+    def set_scan_rate(self, rate):
+        self.scheduler.set_rate(rate)
+
+    def start_scanning(self):
+        self.restart = True
+        self.scanning.set()
+
+    def stop_scanning(self):
+        self.scanning.clear()
+
+    def stop(self, timeout=1.0):
+        self.stopped.set()
+        if self.is_alive():
+            self.join(timeout)
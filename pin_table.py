@@ -0,0 +1,126 @@
+ROW_HEIGHT = 75  # Fits the 65 px switch images plus padding
+HEADER_FONT = ("Helvetica", 22, "bold")
+ROW_FONT = ("Helvetica", 16)
+COM_ROW_COLOR = "#FFE599"
+COLUMNS = ["CODE", "DESCRIPTION", "STATUS"]
+
+class PinTable:
+    # Pin table drawn directly on a Canvas. Only the rows inside the viewport are materialized,
+    # using a pool of canvas items that is recycled while scrolling, so rebuild time and memory
+    # don't grow with the number of pins.
+    # Row indices follow the old grid layout: row 0 is the header, row 1 the first entry of rows.
+    def __init__(self, canvas, scrollbar, on_image, off_image):
+        self.canvas = canvas
+        self.scrollbar = scrollbar
+        self.on_image = on_image
+        self.off_image = off_image
+        self.rows = ()  # (code, description, type, pin number) per table row, see HarnessReference.rows
+        self.states = bytearray(1)  # Row index -> 1 when the switch shows closed (pin pulled to GND)
+        self.widgets = {}  # Row index -> (canvas window item, widget) for embedded widgets like START/STOP
+        self.slots = []  # Recycled rows: [row index or None, background, code, description, status image]
+        self.visible = {}  # Row index -> slot currently drawing it
+        self.header = [canvas.create_text(0, ROW_HEIGHT // 2, text=name, font=HEADER_FONT) for name in COLUMNS]
+        canvas.configure(yscrollcommand=self.on_scroll)
+        canvas.bind("<Configure>", self.on_resize)
+
+    def set_rows(self, rows):
+        for item, widget in self.widgets.values():
+            self.canvas.delete(item)
+            widget.destroy()
+        self.widgets = {}
+        self.rows = tuple(rows)
+        self.states = bytearray(len(self.rows) + 1)
+        for slot in self.slots:
+            self.hide_slot(slot)
+        self.visible = {}
+        self.canvas.configure(scrollregion=(0, 0, self.canvas.winfo_width(), (len(self.rows) + 1) * ROW_HEIGHT))
+        self.canvas.yview_moveto(0)
+        self.refresh()
+
+    def set_state(self, row, on):
+        state = 1 if on else 0
+        if row >= len(self.states) or self.states[row] == state:
+            return
+        self.states[row] = state
+        slot = self.visible.get(row)
+        if slot is not None:
+            self.canvas.itemconfigure(slot[4], image=self.on_image if state else self.off_image)
+
+    def place_widget(self, row, widget):
+        # widget must be a child of the canvas
+        x = self.column_x()
+        item = self.canvas.create_window(x[2], row * ROW_HEIGHT + ROW_HEIGHT // 2, window=widget)
+        self.widgets[row] = (item, widget)
+        slot = self.visible.get(row)
+        if slot is not None:
+            self.canvas.itemconfigure(slot[4], state="hidden")  # Drawn by set_rows before the widget existed
+
+    def column_x(self):
+        width = self.canvas.winfo_width()
+        return [width * (2 * column + 1) // 6 for column in range(len(COLUMNS))]
+
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.refresh()
+
+    def on_resize(self, event):
+        x = self.column_x()
+        for column, item in enumerate(self.header):
+            self.canvas.coords(item, x[column], ROW_HEIGHT // 2)
+        for row, (item, widget) in self.widgets.items():
+            self.canvas.coords(item, x[2], row * ROW_HEIGHT + ROW_HEIGHT // 2)
+        self.canvas.configure(scrollregion=(0, 0, event.width, (len(self.rows) + 1) * ROW_HEIGHT))
+        for row, slot in self.visible.items():
+            self.draw_slot(slot, row)
+        self.refresh()
+
+    def refresh(self):
+        top = self.canvas.canvasy(0)
+        first = max(1, int(top // ROW_HEIGHT))
+        last = min(len(self.rows), int((top + self.canvas.winfo_height()) // ROW_HEIGHT))
+        free = []
+        for row in list(self.visible):
+            if row < first or row > last:
+                free.append(self.visible.pop(row))
+        for row in range(first, last + 1):
+            if row in self.visible:
+                continue
+            slot = free.pop() if free else self.new_slot()
+            self.draw_slot(slot, row)
+            self.visible[row] = slot
+        for slot in free:
+            self.hide_slot(slot)
+
+    def new_slot(self):
+        canvas = self.canvas
+        slot = [None,
+                canvas.create_rectangle(0, 0, 0, 0, width=0),
+                canvas.create_text(0, 0, font=ROW_FONT),
+                canvas.create_text(0, 0, font=ROW_FONT),
+                canvas.create_image(0, 0)]
+        canvas.tag_lower(slot[1])
+        self.slots.append(slot)
+        return slot
+
+    def draw_slot(self, slot, row):
+        code, description, typ, pin_number = self.rows[row - 1]
+        canvas = self.canvas
+        x = self.column_x()
+        y = row * ROW_HEIGHT + ROW_HEIGHT // 2
+        slot[0] = row
+        canvas.coords(slot[1], 0, row * ROW_HEIGHT, 2 * canvas.winfo_width() // 3, (row + 1) * ROW_HEIGHT)
+        canvas.itemconfigure(slot[1], fill=COM_ROW_COLOR if typ == "COM" else "", state="normal")
+        canvas.coords(slot[2], x[0], y)
+        canvas.itemconfigure(slot[2], text=code, state="normal")
+        canvas.coords(slot[3], x[1], y)
+        canvas.itemconfigure(slot[3], text=description, state="normal")
+        canvas.coords(slot[4], x[2], y)
+        if row in self.widgets:
+            canvas.itemconfigure(slot[4], state="hidden")
+        else:
+            canvas.itemconfigure(slot[4], image=self.on_image if self.states[row] else self.off_image, state="normal")
+
+    def hide_slot(self, slot):
+        slot[0] = None
+        for item in slot[1:]:
+            self.canvas.itemconfigure(item, state="hidden")
@@ -0,0 +1,92 @@
+import json
+import os
+import sys
+from array import array
+from functools import lru_cache
+from operator import itemgetter
+
+# Fixture wiring: which logical pin (table row pin number) each expander bit is connected to
+PIN_MAP_FILE = os.environ.get("HARNESS_PIN_MAP", os.path.expanduser("~/.harness_pinmap.json"))
+DECODER_CACHE_SIZE = 16
+
+# LOW_BITS[v] holds one byte per bit of the port value v: 1 where the bit reads 0 (pin at GND)
+LOW_BITS = [bytes((~value >> bit) & 1 for bit in range(8)) for value in range(256)]
+
+class PinMap:
+    # Logical pin of every (channel, address, bit). Devices listed in the mapping file use their
+    # 16 entries (0 = bit not wired); any other device gets the default channel * 16 + bit + 1.
+    # Output bits (e.g. the COM driver) keep their pin here; the decoder and the verdict mask
+    # them out through the device's outputs, since an output never reads the harness.
+    #
+    # File format:
+    #     {"devices": [{"channel": 0, "address": "0x20", "pins": [0, 2, 3, ... 16 entries]}, ...]}
+    def __init__(self, entries=None):
+        self.entries = entries or {}  # (channel, address) -> tuple of 16 logical pins
+
+    def device_pins(self, device):
+        # device is a DeviceInfo
+        pins = self.entries.get((device.channel, device.address))
+        if pins is not None:
+            return pins
+        base = (device.channel or 0) * 16 + 1
+        return tuple(base + bit for bit in range(16))
+
+DEFAULT_PIN_MAP = PinMap()
+
+def load_pin_map(path=PIN_MAP_FILE):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return DEFAULT_PIN_MAP
+    except (OSError, ValueError) as e:
+        print(f"Could not read pin map {path}, using the default mapping: {e}")
+        return DEFAULT_PIN_MAP
+    entries = {}
+    try:
+        for device in data["devices"]:
+            address = device["address"]
+            address = int(address, 0) if isinstance(address, str) else int(address)
+            pins = tuple(int(pin) for pin in device["pins"])
+            if len(pins) != 16:
+                raise ValueError(f"{len(pins)} pins for {device['channel']}:{address:#04x}, expected 16")
+            entries[(device["channel"], address)] = pins
+    except (KeyError, TypeError, ValueError) as e:
+        print(f"Invalid pin map {path}, using the default mapping: {e}")
+        return DEFAULT_PIN_MAP
+    print(f"Loaded pin map {path} ({len(entries)} device(s)).")
+    return PinMap(entries)
+
+class PinDecoder:
+    # Turns the port words of a whole sweep into a pin-state array in one go: the words are
+    # split into bytes, LOW_BITS expands every byte into 8 state bytes (one join), and a
+    # precomputed itemgetter gathers them into logical pin order. states[pin] is 1 when the
+    # logical pin is pulled to GND; index 0, pins without a wired bit and pins on output bits
+    # stay 0.
+    def __init__(self, pin_map, devices):
+        self.devices = devices
+        positions = {}  # Logical pin -> index in the expanded bytes
+        n_pins = 0
+        for index, device in enumerate(devices):
+            for bit, pin in enumerate(pin_map.device_pins(device)):
+                n_pins = max(n_pins, pin)
+                if pin and not device.outputs >> bit & 1:
+                    positions[pin] = 16 * index + bit
+        self.n_pins = n_pins
+        zero = 16 * len(devices)  # An extra 0 byte for unmapped pins
+        indices = [positions.get(pin, zero) for pin in range(self.n_pins + 1)]
+        if len(indices) == 1:
+            self.gather = lambda data: (data[zero],)  # itemgetter of one index returns a scalar
+        else:
+            self.gather = itemgetter(*indices)
+
+    def decode(self, words):
+        data = array('H', words)
+        if sys.byteorder == "big":
+            data.byteswap()  # GPIOA first
+        expanded = b"".join([LOW_BITS[value] for value in data.tobytes()]) + b"\x00"
+        return bytes(self.gather(expanded))
+
+@lru_cache(maxsize=DECODER_CACHE_SIZE)
+def compile_decoder(pin_map, devices):
+    return PinDecoder(pin_map, devices)
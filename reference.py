@@ -0,0 +1,66 @@
+import re
+from functools import lru_cache
+
+REFERENCE_CACHE_SIZE = 256  # Distinct references kept parsed; a line only scans a handful per shift
+
+# CbTp<pin count, 4 digits>Dc<condition count, 2 digits><one two-letter code per condition>
+REFERENCE_PATTERN = re.compile(r"CbTp(\d{4})Dc(\d{2})((?:[A-Z][a-z])*)")
+
+CONDITION_NAMES = {
+    "Lo": "Locking",
+    "Co": "Coding",
+    "Sl": "Seclock",
+    "Cl": "Clips",
+    "Cp": "Cpa",
+    "Cv": "Cover",
+    "Se": "Seal",
+    "La": "Latch",
+    "Ad": "Additional Part"
+}
+
+class HarnessReference:
+    # Parsed QR reference. Instances are immutable and shared through the parse cache.
+    __slots__ = ("code", "n_pins", "condition_codes", "condition_names", "rows")
+
+    def __init__(self, code, n_pins, condition_codes):
+        condition_names = tuple(CONDITION_NAMES.get(c, "Unknown") for c in condition_codes)
+        # Table layout: (code column, description, row type, pin number) for every row after the header
+        rows = [("1", "LED", "LED", 1)]
+        for i in range(1, n_pins + 1):
+            rows.append((f" {i + 1}", f"PIN {i}", "PIN", i + 1))
+        rows.append((f" {n_pins + 2}", "COM", "COM", n_pins + 2))
+        for i, name in enumerate(condition_names, start=1):
+            rows.append((f"{n_pins + 2 + i}", name, "CDN", n_pins + 2 + i))
+        object.__setattr__(self, "code", code)
+        object.__setattr__(self, "n_pins", n_pins)
+        object.__setattr__(self, "condition_codes", tuple(condition_codes))
+        object.__setattr__(self, "condition_names", condition_names)
+        object.__setattr__(self, "rows", tuple(rows))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("HarnessReference is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("HarnessReference is immutable")
+
+    def __eq__(self, other):
+        return isinstance(other, HarnessReference) and self.code == other.code
+
+    def __hash__(self):
+        return hash(self.code)
+
+    def __repr__(self):
+        return f"HarnessReference({self.code!r})"
+
+@lru_cache(maxsize=REFERENCE_CACHE_SIZE)
+def parse_reference(code):
+    match = REFERENCE_PATTERN.fullmatch(code)
+    if match is None:
+        raise ValueError(f"Invalid reference {code!r}, expected CbTp####Dc##<condition codes>")
+    n_pins = int(match.group(1))
+    n_cdns = int(match.group(2))
+    conditions = match.group(3)
+    condition_codes = [conditions[i:i + 2] for i in range(0, len(conditions), 2)]
+    if len(condition_codes) != n_cdns:
+        raise ValueError(f"Reference {code!r} declares {n_cdns} conditions but lists {len(condition_codes)}")
+    return HarnessReference(code, n_pins, condition_codes)
@@ -0,0 +1,70 @@
+import time
+from collections import deque
+
+RENDER_FPS = 25  # Table refreshes per second, whatever the scan rate
+FRAME_BUDGET = 0.008  # Seconds of widget updates per frame, the rest is carried over to the next frames
+
+class TableRenderer:
+    # Sits between the snapshots and the PinTable: set_state() only records the latest state of
+    # a row, and a Tk timer applies the recorded changes to the canvas RENDER_FPS times per
+    # second. A row that flips several times between two frames is drawn once, and a frame stops
+    # after FRAME_BUDGET so a long table is brought up to date over a few frames instead of
+    # blocking the event loop.
+    # poll is called at the start of every frame, e.g. to drain the worker's latest snapshot.
+    def __init__(self, master, table, poll=None, fps=RENDER_FPS, budget=FRAME_BUDGET):
+        self.master = master
+        self.table = table
+        self.poll = poll
+        self.interval = max(1, 1000 // fps)  # ms
+        self.budget = budget
+        self.latest = {}  # Row index -> state waiting to be drawn
+        self.order = deque()  # Rows of latest, oldest change first
+        self.frame_job = None
+        self.frames = 0
+        self.overruns = 0  # Frames that ran out of budget with rows left
+
+    def start(self):
+        if self.frame_job is None:
+            self.frame_job = self.master.after(self.interval, self.frame)
+
+    def stop(self):
+        if self.frame_job is not None:
+            self.master.after_cancel(self.frame_job)
+            self.frame_job = None
+
+    def set_state(self, row, on):
+        if row not in self.latest:
+            self.order.append(row)
+        self.latest[row] = on
+
+    def clear(self):
+        # Drop pending changes, e.g. before the table gets new rows
+        self.latest.clear()
+        self.order.clear()
+
+    def frame(self):
+        # Scheduled first so a slow frame doesn't push every later frame back
+        self.frame_job = self.master.after(self.interval, self.frame)
+        self.frames += 1
+        if self.poll is not None:
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Error while polling for a new frame: {e}")
+        self.flush()
+
+    def flush(self):
+        deadline = time.perf_counter() + self.budget
+        latest = self.latest
+        order = self.order
+        set_state = self.table.set_state
+        while order:
+            row = order.popleft()
+            set_state(row, latest.pop(row))
+            if time.perf_counter() >= deadline:
+                if order:
+                    self.overruns += 1
+                return
+
+    def stats(self):
+        return {"fps": 1000 / self.interval, "frames": self.frames, "overruns": self.overruns, "pending": len(self.order)}
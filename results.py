@@ -0,0 +1,140 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from array import array
+from collections import namedtuple
+
+RESULTS_DB = os.path.expanduser("~/harness_results.db")
+RESULTS_BATCH_SIZE = 64  # Records committed per transaction at most
+RESULTS_FLUSH_INTERVAL = 1.0  # Seconds a record may wait in the queue before it is committed
+
+# One tested harness. devices is "channel:address" per expander (hex address), words the packed
+# '<H' port words of the last snapshot, pins lists of logical pin numbers as in Verdict.
+TestResult = namedtuple("TestResult", ["id", "user", "reference", "started", "finished", "passed", "open_pins",
+                                       "short_pins", "unreadable_pins", "devices", "words", "scans", "snapshots"])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    user TEXT NOT NULL,
+    reference TEXT NOT NULL,
+    started REAL NOT NULL,
+    finished REAL NOT NULL,
+    passed INTEGER NOT NULL,
+    open_pins TEXT NOT NULL,
+    short_pins TEXT NOT NULL,
+    unreadable_pins TEXT NOT NULL,
+    devices TEXT NOT NULL,
+    words BLOB NOT NULL,
+    scans INTEGER NOT NULL,
+    snapshots INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_reference ON results (reference, started);
+CREATE INDEX IF NOT EXISTS results_started ON results (started);
+"""
+
+def connect(path=RESULTS_DB):
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode=WAL")  # Readers (reports) never block the writer
+    connection.execute("PRAGMA synchronous=NORMAL")  # Durable at each checkpoint, cheap commits
+    connection.executescript(SCHEMA)
+    return connection
+
+def pin_list(pins):
+    return ",".join(str(pin) for pin in pins)
+
+class ResultLog(threading.Thread):
+    # Append-only test result log in SQLite. record() only queues the result; this thread
+    # commits them in batches, so logging never waits on the disk.
+    def __init__(self, path=RESULTS_DB, batch_size=RESULTS_BATCH_SIZE, flush_interval=RESULTS_FLUSH_INTERVAL):
+        super().__init__(daemon=True)
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.records = queue.Queue()
+        self.stopped = threading.Event()
+        self.written = 0
+
+    def record(self, user, reference, started, finished, verdict, devices, words, scans=0, snapshots=0):
+        # verdict is a verdict.Verdict, devices the DeviceInfo tuple and words the port words of
+        # the last snapshot of the test
+        self.records.put((
+            user, reference, started, finished, int(verdict.passed),
+            pin_list(verdict.open_pins), pin_list(verdict.short_pins), pin_list(verdict.unreadable_pins),
+            ",".join(f"{'-' if device.channel is None else device.channel}:{device.address:02x}" for device in devices),
+            array('H', words).tobytes(), scans, snapshots,
+        ))
+
+    def run(self):
+        try:
+            connection = connect(self.path)
+        except sqlite3.Error as e:
+            print(f"Could not open results database {self.path}: {e}")
+            return
+        try:
+            while not (self.stopped.is_set() and self.records.empty()):
+                try:
+                    batch = [self.records.get(timeout=self.flush_interval)]
+                except queue.Empty:
+                    continue
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.records.get(timeout=max(0.0, deadline - time.monotonic())))
+                    except queue.Empty:
+                        break
+                try:
+                    with connection:
+                        connection.executemany(
+                            "INSERT INTO results (user, reference, started, finished, passed, open_pins, short_pins, "
+                            "unreadable_pins, devices, words, scans, snapshots) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            batch)
+                    self.written += len(batch)
+                except sqlite3.Error as e:
+                    print(f"Could not write {len(batch)} test result(s): {e}")
+        finally:
+            connection.close()
+
+    def stop(self, timeout=5.0):
+        # Commits whatever is still queued before returning
+        self.stopped.set()
+        if self.is_alive():
+            self.join(timeout)
+
+def query_results(reference=None, start=None, end=None, limit=None, path=RESULTS_DB):
+    # Results of one reference and/or of the [start, end) time range (epoch seconds), newest first
+    sql = "SELECT * FROM results"
+    conditions = []
+    params = []
+    if reference is not None:
+        conditions.append("reference = ?")
+        params.append(reference)
+    if start is not None:
+        conditions.append("started >= ?")
+        params.append(start)
+    if end is not None:
+        conditions.append("started < ?")
+        params.append(end)
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY started DESC"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    connection = connect(path)
+    try:
+        return [TestResult(*row) for row in connection.execute(sql, params)]
+    finally:
+        connection.close()
+
+def shift_report(start, end, path=RESULTS_DB):
+    # (reference, tested, passed, failed) per reference for the [start, end) time range
+    connection = connect(path)
+    try:
+        return connection.execute(
+            "SELECT reference, COUNT(*), SUM(passed), COUNT(*) - SUM(passed) FROM results "
+            "WHERE started >= ? AND started < ? GROUP BY reference ORDER BY reference", (start, end)).fetchall()
+    finally:
+        connection.close()
@@ -0,0 +1,96 @@
+import random
+import threading
+import time
+
+RETRY_ATTEMPTS = 5
+FIRST_RETRY_DELAY = 0.0002  # Seconds before the first retry: most NACKs are transient
+MAX_RETRY_DELAY = 0.05  # Upper bound of the exponential backoff
+BACKOFF_FACTOR = 4
+JITTER = 0.5  # Each delay is randomized by +/- 50% so devices don't retry in lockstep
+BREAKER_THRESHOLD = 3  # Consecutive failed calls before a device is marked unhealthy
+HEALTH_PROBE_INTERVAL = 2.0  # Seconds between single-attempt probes of an unhealthy device
+
+class RetryPolicy:
+    # Shared retry policy for the I2C drivers: exponential backoff with jitter, and a circuit
+    # breaker per device (key) so a dead expander is skipped instead of stalling every scan.
+    # While a device is unhealthy, one call per HEALTH_PROBE_INTERVAL goes through with a single
+    # attempt; if it succeeds the device is healthy again.
+    #
+    # Drivers use it in place of a fixed retry loop:
+    #     for attempt in policy.attempts(key):
+    #         try:
+    #             ...
+    #             policy.success(key)
+    #             return result
+    #         except OSError:
+    #             ...
+    # attempts() records the failure itself once every attempt has been used up.
+    def __init__(self, attempts=RETRY_ATTEMPTS, first_delay=FIRST_RETRY_DELAY, max_delay=MAX_RETRY_DELAY,
+                 factor=BACKOFF_FACTOR, jitter=JITTER, threshold=BREAKER_THRESHOLD,
+                 probe_interval=HEALTH_PROBE_INTERVAL):
+        self.max_attempts = attempts
+        self.first_delay = first_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.jitter = jitter
+        self.threshold = threshold
+        self.probe_interval = probe_interval
+        self.lock = threading.Lock()
+        self.failures = {}  # key -> consecutive failed calls
+        self.next_probe = {}  # key -> monotonic time of the next health probe, for unhealthy keys
+        self.counters = {"calls": 0, "retries": 0, "failures": 0, "skipped": 0, "trips": 0, "recoveries": 0}
+
+    def attempts(self, key=None):
+        with self.lock:
+            self.counters["calls"] += 1
+            probe_at = self.next_probe.get(key)
+            if probe_at is None:
+                tries = self.max_attempts
+            elif time.monotonic() >= probe_at:
+                tries = 1  # Health probe
+                self.next_probe[key] = time.monotonic() + self.probe_interval
+            else:
+                self.counters["skipped"] += 1
+                return
+        delay = self.first_delay
+        for attempt in range(tries):
+            if attempt:
+                with self.lock:
+                    self.counters["retries"] += 1
+                time.sleep(delay * (1 + self.jitter * (2 * random.random() - 1)))
+                delay = min(delay * self.factor, self.max_delay)
+            yield attempt
+        # Only reached when the caller never returned, i.e. every attempt failed
+        self.failure(key)
+
+    def success(self, key=None):
+        with self.lock:
+            self.failures.pop(key, None)
+            if self.next_probe.pop(key, None) is not None:
+                self.counters["recoveries"] += 1
+
+    def failure(self, key=None):
+        with self.lock:
+            self.counters["failures"] += 1
+            failures = self.failures.get(key, 0) + 1
+            self.failures[key] = failures
+            if failures >= self.threshold and key not in self.next_probe:
+                self.counters["trips"] += 1
+                self.next_probe[key] = time.monotonic() + self.probe_interval
+
+    def healthy(self, key=None):
+        return key not in self.next_probe
+
+    def skipping(self, key=None):
+        # True when the next call for key is skipped by the breaker, i.e. makes no bus transaction
+        probe_at = self.next_probe.get(key)
+        return probe_at is not None and time.monotonic() < probe_at
+
+    def stats(self):
+        # Snapshot of the counters and the currently unhealthy devices, for monitoring
+        with self.lock:
+            stats = dict(self.counters)
+            stats["unhealthy"] = sorted(self.next_probe, key=repr)
+        return stats
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
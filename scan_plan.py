@@ -0,0 +1,19 @@
+from functools import lru_cache
+from pinmap import DEFAULT_PIN_MAP
+from verdict import compile_expected
+
+SCAN_PLAN_CACHE_SIZE = 64  # (reference, device layout) pairs kept compiled
+
+@lru_cache(maxsize=SCAN_PLAN_CACHE_SIZE)
+def compile_scan_plan(reference, devices, pin_map=DEFAULT_PIN_MAP):
+    # Minimal scan for a reference: for each device of the layout (the DeviceInfo tuple of the
+    # worker) the ports that hold a bit the verdict judges, as read_all_gpio's ports argument
+    # (0 = skip the device, 1 = GPIOA, 2 = GPIOB, 3 = both). That is the reference's own pins
+    # (must read GND) and every other wired input (must stay high, or it is a short), so only
+    # ports with nothing but outputs and unwired bits are left out.
+    expected = compile_expected(reference, devices, pin_map)
+    ports = []
+    for low, high in zip(expected.must_low, expected.must_high):
+        judged = low | high
+        ports.append((1 if judged & 0x00FF else 0) | (2 if judged & 0xFF00 else 0))
+    return tuple(ports)
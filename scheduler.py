@@ -0,0 +1,90 @@
+import math
+import time
+from collections import deque
+
+STATS_WINDOW = 512  # Recent cycles the rate and jitter statistics are computed over
+MAX_LATENESS_CYCLES = 4  # A cycle later than this many periods resyncs instead of bursting to catch up
+
+class CycleScheduler:
+    # Fixed-rate cycle timing on the monotonic clock. Deadlines are advanced by whole periods
+    # from the previous deadline, not from the end of the previous cycle, so the time a scan
+    # takes does not stretch the period and the achieved rate stays on target on average.
+    # A loop that fell too far behind (bus stall, paused polling) drops the missed cycles and
+    # resyncs rather than running them back to back.
+    #
+    #     scheduler.reset()
+    #     while running:
+    #         sleep(scheduler.delay())
+    #         if scheduler.due():
+    #             scheduler.tick()
+    #             scan()
+    # The owning thread calls everything but stats() / report(), which the UI may call anytime.
+    def __init__(self, interval, window=STATS_WINDOW):
+        self.interval = interval
+        self.starts = deque(maxlen=window)  # Monotonic start time of the recent cycles
+        self.lateness = deque(maxlen=window)  # Seconds each recent cycle started after its deadline
+        self.deadline = time.monotonic()
+        self.cycles = 0
+        self.skipped = 0  # Cycles dropped by resyncs
+
+    @property
+    def rate(self):
+        return 1.0 / self.interval
+
+    def set_rate(self, rate):
+        self.interval = 1.0 / rate
+        self.reset()
+
+    def reset(self):
+        # Next cycle is due at once; statistics restart so a pause doesn't count as jitter
+        self.deadline = time.monotonic()
+        self.starts.clear()
+        self.lateness.clear()
+
+    def delay(self, now=None):
+        # Seconds until the next cycle is due (0 when it is already due)
+        if now is None:
+            now = time.monotonic()
+        return max(0.0, self.deadline - now)
+
+    def due(self, now=None):
+        if now is None:
+            now = time.monotonic()
+        return now >= self.deadline
+
+    def tick(self, now=None):
+        # Start the due cycle and schedule the next one
+        if now is None:
+            now = time.monotonic()
+        late = now - self.deadline
+        if late > MAX_LATENESS_CYCLES * self.interval:
+            missed = int(late / self.interval)
+            self.skipped += missed
+            self.deadline += missed * self.interval
+            late -= missed * self.interval
+        self.starts.append(now)
+        self.lateness.append(late)
+        self.cycles += 1
+        self.deadline += self.interval
+
+    def stats(self):
+        starts = list(self.starts)
+        lateness = list(self.lateness)
+        n = len(lateness)
+        achieved = (len(starts) - 1) / (starts[-1] - starts[0]) if len(starts) > 1 and starts[-1] > starts[0] else 0.0
+        mean = sum(lateness) / n if n else 0.0
+        return {
+            "target_hz": self.rate,
+            "achieved_hz": achieved,
+            "jitter_mean_ms": mean * 1000,
+            "jitter_std_ms": math.sqrt(sum((x - mean) ** 2 for x in lateness) / n) * 1000 if n else 0.0,
+            "jitter_max_ms": max(lateness, default=0.0) * 1000,
+            "cycles": self.cycles,
+            "skipped": self.skipped,
+        }
+
+    def report(self):
+        s = self.stats()
+        return (f"Scan rate: {s['achieved_hz']:.1f} / {s['target_hz']:.1f} Hz, "
+                f"jitter mean {s['jitter_mean_ms']:.3f} ms, std {s['jitter_std_ms']:.3f} ms, "
+                f"max {s['jitter_max_ms']:.3f} ms, {s['skipped']} skipped of {s['cycles']}")
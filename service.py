@@ -0,0 +1,349 @@
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+from acquisition import AcquisitionWorker, DeviceInfo, PinSnapshot, scan_rate, put_latest, drain_latest
+from bus import open_bus
+from hardware import MCP23017_ADDR_BASE
+from multibus import MultiBusEngine, i2c_buses
+from pinmap import load_pin_map, DEFAULT_PIN_MAP
+from reference import parse_reference
+from verdict import compile_expected
+
+# Unix socket of the scanner daemon; the apps use it instead of opening the bus when it exists
+SCANNER_SOCKET = os.environ.get("HARNESS_SCANNER_SOCKET", "/tmp/harness_scanner.sock")
+SUBSCRIBER_QUEUE_SIZE = 64  # Messages buffered per client, the oldest are dropped for slow readers
+SCANS_INTERVAL = 0.2  # Seconds between the scan counts pushed to subscribers
+
+# Protocol: one JSON object per line in both directions. Requests have a "cmd":
+#   {"cmd": "subscribe", "reference": "CbTp..."}   stream every snapshot (and its verdict when a
+#                                                    reference is given) until the client disconnects
+#   {"cmd": "snapshot"}                             the latest snapshot
+#   {"cmd": "verdict", "reference": "CbTp..."}      the latest snapshot judged against a reference
+#   {"cmd": "scans"}                                raw scans done so far, {"type": "scans", "scans": n}
+#   {"cmd": "info"}                                 the outputs the service drives (address -> mask) and
+#                                                    the scan count, {"type": "info", "outputs": [[32, 1]], "scans": n}
+#   {"cmd": "start"} / {"cmd": "stop"}              start / stop scanning for every client (maintenance)
+#   {"cmd": "write_pin", "address": 32, "pin": 0, "high": true}
+# Replies are {"type": "snapshot", ...}, {"type": "verdict", ...}, {"type": "scans", ...}, {"type": "info", ...},
+# {"type": "ok"} or {"type": "error", "message": ...}. Subscribers also get a "scans" message every SCANS_INTERVAL.
+
+def snapshot_message(snapshot, scans):
+    return {
+        "type": "snapshot",
+        "timestamp": snapshot.timestamp,
+        "sequence": snapshot.sequence,
+        "devices": [list(device) for device in snapshot.devices],
+        "words": list(snapshot.words),
+        "failed": list(snapshot.failed),
+        "scans": scans,
+    }
+
+def verdict_message(snapshot, reference, pin_map=DEFAULT_PIN_MAP):
+    verdict = compile_expected(reference, snapshot.devices, pin_map).evaluate(snapshot.words, snapshot.failed)
+    return {
+        "type": "verdict",
+        "sequence": snapshot.sequence,
+        "reference": reference.code,
+        "passed": verdict.passed,
+        "open_pins": list(verdict.open_pins),
+        "short_pins": list(verdict.short_pins),
+        "unreadable_pins": list(verdict.unreadable_pins),
+    }
+
+def encode(message):
+    return (json.dumps(message, separators=(",", ":")) + "\n").encode()
+
+def service_running(path=SCANNER_SOCKET):
+    # A socket file is left behind when the service is killed, so only a connection proves it runs
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(1.0)
+            sock.connect(path)
+        return True
+    except OSError:
+        return False
+
+def service_info(path=SCANNER_SOCKET):
+    # The running service's "info" reply with outputs as a dict, or None when no service runs
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(1.0)
+            sock.connect(path)
+            sock.sendall(encode({"cmd": "info"}))
+            reply = json.loads(sock.makefile("rb").readline() or b"{}")
+    except (OSError, ValueError):
+        return None
+    if reply.get("type") != "info":
+        return None
+    reply["outputs"] = {address: mask for address, mask in reply["outputs"]}
+    return reply
+
+class Subscriber:
+    # Per-client outgoing queue. Snapshot lines are encoded once by the service and shared by
+    # every subscriber; only verdicts for the client's own reference are computed per client.
+    def __init__(self, reference=None):
+        self.reference = reference
+        self.messages = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def put(self, data):
+        put_latest(self.messages, data)
+
+class ScannerService:
+    # Headless owner of the I2C bus: one AcquisitionWorker scans the fixture and its snapshots
+    # are fanned out to any number of socket clients. Clients never cause bus traffic by reading,
+    # only by the explicit start/stop/write_pin commands.
+    def __init__(self, worker, path=SCANNER_SOCKET, pin_map=DEFAULT_PIN_MAP):
+        self.worker = worker
+        self.path = path
+        self.pin_map = pin_map
+        self.lock = threading.Lock()
+        self.subscribers = []
+        self.latest = None
+        self.latest_line = None
+        self.stopped = threading.Event()
+        self.server = None
+
+    def serve_forever(self):
+        # Returns False without touching the bus when another service already owns it
+        if service_running(self.path):
+            print(f"A scanner service is already listening on {self.path}, not starting a second one.")
+            return False
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # Stale socket of a killed service
+        service = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                service.handle_client(self.rfile, self.wfile)
+
+        self.server = socketserver.ThreadingUnixStreamServer(self.path, Handler)
+        self.server.daemon_threads = True
+        self.worker.start()
+        self.worker.start_scanning()
+        threading.Thread(target=self.dispatch, daemon=True).start()
+        print(f"Scanner service listening on {self.path}")
+        try:
+            self.server.serve_forever()
+        finally:
+            self.stop()
+
+    def stop(self):
+        self.stopped.set()
+        self.worker.stop()
+        if self.server is not None:
+            self.server.server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def dispatch(self):
+        next_scans = time.monotonic()
+        while not self.stopped.is_set():
+            now = time.monotonic()
+            if now >= next_scans:
+                # Snapshots only come when the pins change, so the count is pushed on its own too
+                next_scans = now + SCANS_INTERVAL
+                line = encode({"type": "scans", "scans": self.worker.scans})
+                with self.lock:
+                    subscribers = list(self.subscribers)
+                for subscriber in subscribers:
+                    subscriber.put(line)
+            try:
+                snapshot = self.worker.snapshots.get(timeout=max(0.0, next_scans - now))
+            except queue.Empty:
+                continue
+            line = encode(snapshot_message(snapshot, self.worker.scans))
+            with self.lock:
+                self.latest = snapshot
+                self.latest_line = line
+                subscribers = list(self.subscribers)
+            for subscriber in subscribers:
+                subscriber.put(line)
+                if subscriber.reference is not None:
+                    subscriber.put(encode(verdict_message(snapshot, subscriber.reference, self.pin_map)))
+
+    def handle_client(self, rfile, wfile):
+        for line in rfile:
+            try:
+                request = json.loads(line)
+                cmd = request["cmd"]
+                if cmd == "subscribe":
+                    self.stream(wfile, self.reference(request))
+                    return
+                wfile.write(self.command(cmd, request))
+                wfile.flush()
+            except (ValueError, KeyError, TypeError) as e:
+                wfile.write(encode({"type": "error", "message": str(e)}))
+                wfile.flush()
+            except OSError:
+                return
+
+    def reference(self, request):
+        code = request.get("reference")
+        return parse_reference(code) if code else None
+
+    def command(self, cmd, request):
+        if cmd == "snapshot":
+            with self.lock:
+                line = self.latest_line
+            return line or encode({"type": "error", "message": "no snapshot yet"})
+        if cmd == "verdict":
+            with self.lock:
+                snapshot = self.latest
+            if snapshot is None:
+                return encode({"type": "error", "message": "no snapshot yet"})
+            return encode(verdict_message(snapshot, parse_reference(request["reference"]), self.pin_map))
+        if cmd == "scans":
+            return encode({"type": "scans", "scans": self.worker.scans})
+        if cmd == "info":
+            outputs = [[address, mask] for address, mask in sorted(self.worker.outputs.items())]
+            return encode({"type": "info", "outputs": outputs, "scans": self.worker.scans})
+        if cmd == "start":
+            self.worker.start_scanning()
+        elif cmd == "stop":
+            self.worker.stop_scanning()
+        elif cmd == "write_pin":
+            self.worker.write_pin(int(request["address"]), int(request["pin"]), bool(request["high"]))
+        else:
+            raise ValueError(f"unknown command {cmd!r}")
+        return encode({"type": "ok"})
+
+    def stream(self, wfile, reference):
+        subscriber = Subscriber(reference)
+        with self.lock:
+            self.subscribers.append(subscriber)
+            line = self.latest_line
+            snapshot = self.latest
+        try:
+            if line is not None:
+                wfile.write(line)  # Current state first, then every change
+                if reference is not None:
+                    wfile.write(encode(verdict_message(snapshot, reference, self.pin_map)))
+                wfile.flush()
+            while not self.stopped.is_set():
+                try:
+                    data = subscriber.messages.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                wfile.write(data)
+                wfile.flush()
+        except OSError:
+            pass  # Client went away
+        finally:
+            with self.lock:
+                self.subscribers.remove(subscriber)
+
+class RemoteWorker(threading.Thread):
+    # Stand-in for AcquisitionWorker that follows the scanner service instead of opening the bus:
+    # same snapshots queue, latest_snapshot() and commands, so the apps can use either.
+    def __init__(self, path=SCANNER_SOCKET, snapshot_queue_size=8):
+        super().__init__(daemon=True)
+        self.path = path
+        self.bus = None  # No local bus, so no local I2C tracing
+        self.snapshots = queue.Queue(maxsize=snapshot_queue_size)
+        self.stopped = threading.Event()
+        self.sock = None
+        self.scans = 0  # Last count pushed by the service, so reading it never waits on the socket
+        self.commands = queue.Queue()  # Sent in order by their own thread, callers never wait on the socket
+
+    def run(self):
+        threading.Thread(target=self.send_commands, daemon=True).start()
+        try:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(self.path)
+            self.sock.sendall(encode({"cmd": "subscribe"}))
+            for line in self.sock.makefile("rb"):
+                if self.stopped.is_set():
+                    break
+                message = json.loads(line)
+                if message.get("type") == "scans":
+                    self.scans = message["scans"]
+                if message.get("type") != "snapshot":
+                    continue
+                self.scans = message["scans"]
+                snapshot = PinSnapshot(message["timestamp"], message["sequence"],
+                                       tuple(DeviceInfo(*device) for device in message["devices"]),
+                                       tuple(message["words"]), tuple(message["failed"]))
+                put_latest(self.snapshots, snapshot)
+        except (OSError, ValueError) as e:
+            if not self.stopped.is_set():
+                print(f"Lost connection to the scanner service {self.path}: {e}")
+
+    def send_commands(self):
+        while not self.stopped.is_set():
+            try:
+                message = self.commands.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            self.request(message)
+
+    def request(self, message):
+        # Commands use their own short-lived connection, the subscription stream stays one-way
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(self.path)
+                sock.sendall(encode(message))
+                reply = json.loads(sock.makefile("rb").readline() or b"{}")
+        except (OSError, ValueError) as e:
+            print(f"Scanner service request {message['cmd']} failed: {e}")
+            return None
+        if reply.get("type") == "error":
+            print(f"Scanner service request {message['cmd']} failed: {reply.get('message')}")
+        return reply
+
+    def write_pin(self, address, pin, high):
+        self.commands.put({"cmd": "write_pin", "address": address, "pin": pin, "high": high})
+
+    def set_reference(self, reference):
+        pass  # The service scans every pin for all of its clients
+
+    def start_scanning(self):
+        pass  # The service scans for every client (logger, MES bridge...), one app doesn't stop it
+
+    def stop_scanning(self):
+        pass
+
+    def stop(self, timeout=1.0):
+        self.stopped.set()
+        if self.sock is not None:
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.sock.close()
+        if self.is_alive():
+            self.join(timeout)
+
+    def latest_snapshot(self):
+        return drain_latest(self.snapshots)
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless harness scanner serving pin snapshots on a Unix socket")
+    parser.add_argument("--socket", default=SCANNER_SOCKET, help="Unix socket path")
+    parser.add_argument("--com", action="store_true", help="drive A0 of the base expander as the COM output")
+    parser.add_argument("--buses", help="comma-separated I2C bus numbers, scanned in parallel when there are "
+                                            "several (default HARNESS_I2C_BUSES or 1)")
+    parser.add_argument("--rate", type=float, help="target scans per second (default HARNESS_SCAN_RATE or 200)")
+    args = parser.parse_args()
+    outputs = {MCP23017_ADDR_BASE: 0x0001} if args.com else None
+    buses = [int(n) for n in args.buses.split(",")] if args.buses else i2c_buses()
+    pin_map = load_pin_map()
+    interval = 1.0 / (args.rate or scan_rate())
+    if len(buses) > 1:
+        worker = MultiBusEngine(open_bus, buses, outputs=outputs, interval=interval)
+    else:
+        worker = AcquisitionWorker(lambda: open_bus(buses[0]), outputs=outputs, interval=interval, pin_map=pin_map)
+    service = ScannerService(worker, args.socket, pin_map)
+    try:
+        if service.serve_forever() is False:
+            sys.exit(1)
+    except KeyboardInterrupt:
+        print("\nScanner service stopped.")
+
+if __name__ == "__main__":
+    main()
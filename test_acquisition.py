@@ -0,0 +1,18 @@
+from array import array
+from acquisition import AcquisitionWorker, DeviceInfo, DEFAULT_SCAN_RATE, scan_rate
+
+def test_device_failing_on_the_first_scan_is_not_published_as_grounded():
+    worker = AcquisitionWorker(open_bus=None)
+    worker.devices = (DeviceInfo(0, 0x20, 0), DeviceInfo(2, 0x22, 0))
+    worker.sample(array('H', [0xFFFE, 0xFFFF]), [1])
+    snapshot = worker.latest_snapshot()
+    assert snapshot.words == (0xFFFE, 0xFFFF)
+    assert snapshot.failed == (1,)
+
+def test_bad_scan_rate_falls_back_to_the_default(monkeypatch):
+    monkeypatch.setenv("HARNESS_SCAN_RATE", "fast")
+    assert scan_rate() == DEFAULT_SCAN_RATE
+    monkeypatch.setenv("HARNESS_SCAN_RATE", "0")
+    assert scan_rate() == DEFAULT_SCAN_RATE
+    monkeypatch.setenv("HARNESS_SCAN_RATE", "500")
+    assert AcquisitionWorker(open_bus=None).scheduler.rate == 500
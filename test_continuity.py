@@ -0,0 +1,31 @@
+from bus import SimulatedBus
+from continuity import ContinuityMatrix, ContinuityTester
+from hardware import TCA9548A, MCP23017
+from retry import RetryPolicy
+
+def test_matrix_nets_and_asymmetric_pairs():
+    matrix = ContinuityMatrix(range(4), [0b0010, 0b0001, 0b0000, 0b0001])
+    assert matrix.nets() == [[0, 1], [0, 1, 3]]  # 3 -> 0 is only seen from pin 3
+    assert matrix.asymmetric() == [(3, 0)]
+
+def test_matrix_compare():
+    matrix = ContinuityMatrix(range(3), [0b010, 0b001, 0b000])
+    opens, shorts = matrix.compare([0b100, 0b000, 0b001])
+    assert opens == [(0, 2)]
+    assert shorts == [(0, 1)]
+
+def test_tester_finds_wires_on_the_simulated_harness():
+    bus = SimulatedBus(channels={0: [0x20], 2: [0x22]})
+    retry = RetryPolicy()
+    devices = []
+    for channel in (0, 2):
+        bus.mask = 1 << channel
+        mcp = MCP23017(bus, 0x20 + channel, channel=channel, retry=retry)
+        mcp.configure_as_inputs_with_pullups()
+        devices.append((channel, mcp))
+    bus.connect((0, 0x20, 3), (2, 0x22, 5))
+    bus.connect((0, 0x20, 8), (0, 0x20, 9), (2, 0x22, 15))
+    matrix = ContinuityTester(TCA9548A(bus, retry=retry), devices).run()
+    assert matrix is not None
+    assert matrix.nets() == [[3, 21], [8, 9, 31]]
+    assert matrix.asymmetric() == []
@@ -0,0 +1,27 @@
+from debounce import Debouncer
+
+def test_first_sample_is_taken_as_is():
+    debouncer = Debouncer(4)
+    assert debouncer.update([0xFFFE, 0x1234])
+    assert list(debouncer.words(2)) == [0xFFFE, 0x1234]
+
+def test_short_glitch_is_ignored():
+    debouncer = Debouncer(4)
+    debouncer.update([0xFFFF])
+    for word in (0xFFFE, 0xFFFF, 0xFFFE):
+        assert not debouncer.update([word])
+    assert debouncer.word(0) == 0xFFFF
+
+def test_change_is_accepted_after_enough_samples():
+    debouncer = Debouncer(3)
+    debouncer.update([0xFFFF])
+    assert not debouncer.update([0xFFFE])
+    assert not debouncer.update([0xFFFE])
+    assert debouncer.update([0xFFFE])
+    assert debouncer.word(0) == 0xFFFE
+    assert debouncer.settled
+
+def test_unknown_state_reads_as_nothing_grounded():
+    debouncer = Debouncer(4)
+    assert debouncer.word(1) == 0xFFFF
+    assert list(debouncer.words(2)) == [0xFFFF, 0xFFFF]
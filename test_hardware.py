@@ -0,0 +1,124 @@
+from bus import SimulatedBus
+from hardware import TCA9548A, MCP23017, read_all_gpio, mux_groups
+from retry import RetryPolicy
+
+def devices(bus, retry):
+    result = []
+    for channel in range(8):
+        mcp = MCP23017(bus, 0x20 + channel, channel=channel, retry=retry)
+        bus.mask = 1 << channel
+        mcp.configure_as_inputs_with_pullups()
+        result.append((channel, mcp))
+    return result
+
+def test_read_all_gpio_reports_grounded_pins():
+    bus = SimulatedBus()
+    retry = RetryPolicy()
+    tca = TCA9548A(bus, retry=retry)
+    mcps = devices(bus, retry)
+    bus.expander(3, 0x23).set_grounded(0x8001)
+    words, failed = read_all_gpio(tca, mcps, groups=mux_groups(mcps))
+    assert failed == []
+    assert words[3] == 0x7FFE
+    assert all(word == 0xFFFF for index, word in enumerate(words) if index != 3)
+
+def test_skipped_device_does_not_force_a_mux_write():
+    bus = SimulatedBus()
+    retry = RetryPolicy(first_delay=0, max_delay=0, threshold=1, probe_interval=60)
+    tca = TCA9548A(bus, retry=retry, verify_every=0)
+    mcps = devices(bus, retry)[:1]
+    bus.dead.add((0, 0x20))
+    words, failed = read_all_gpio(tca, mcps)
+    assert failed == [0] and not retry.healthy((0, 0x20))
+    read_all_gpio(tca, mcps)  # Reselects the mux once after the real failure
+    transactions = bus.transactions
+    words, failed = read_all_gpio(tca, mcps)
+    assert failed == [0]
+    assert bus.transactions == transactions  # Breaker open: no read, no mux write
+
+def test_failed_mux_select_does_not_read_the_previous_channel():
+    bus = SimulatedBus(channels={0: [0x20], 1: [0x20]})  # Colliding addresses, one group per channel
+    retry = RetryPolicy(first_delay=0, max_delay=0)
+    tca = TCA9548A(bus, retry=retry, verify_every=0)
+    mcps = []
+    for channel in range(2):
+        mcp = MCP23017(bus, 0x20, channel=channel, retry=retry)
+        bus.mask = 1 << channel
+        mcp.configure_as_inputs_with_pullups()
+        mcps.append((channel, mcp))
+    bus.expander(0, 0x20).set_grounded(0x0001)
+    tca.select_mask(0x01)
+    bus.dead.add((None, 0x70))
+    words, failed = read_all_gpio(tca, mcps, groups=mux_groups(mcps))
+    assert words[0] == 0xFFFE  # Already selected, read without a mux write
+    assert failed == [1]
+    assert words[1] == 0xFFFF  # Not channel 0's grounded pin
+    assert tca.mask is None
+
+def test_redundant_mux_select_costs_nothing():
+    bus = SimulatedBus()
+    tca = TCA9548A(bus, retry=RetryPolicy(), verify_every=0)
+    tca.select_channel(2)
+    tca.select_channel(2)
+    tca.select_mask(0x04)
+    assert bus.transactions == 1
+    assert bus.mask == 0x04
+
+def test_mux_selection_is_read_back_every_nth_switch():
+    bus = SimulatedBus()
+    tca = TCA9548A(bus, retry=RetryPolicy(), verify_every=3)
+    for channel in range(6):
+        assert tca.select_mask(1 << channel)
+    assert bus.transactions == 6 + 2  # Six writes, reads after the 3rd and 6th
+
+def test_invalidate_forces_the_next_select():
+    bus = SimulatedBus()
+    tca = TCA9548A(bus, retry=RetryPolicy(), verify_every=0)
+    tca.select_channel(5)
+    tca.invalidate()
+    assert tca.mask is None
+    tca.select_channel(5)
+    assert bus.transactions == 2
+
+def configured(bus, retry, channel=0, outputs=0x0000):
+    bus.mask = 1 << channel
+    mcp = MCP23017(bus, 0x20 + channel, outputs=outputs, channel=channel, retry=retry)
+    mcp.configure_as_inputs_with_pullups()
+    return mcp
+
+def test_unchanged_register_costs_no_transaction():
+    bus = SimulatedBus()
+    mcp = configured(bus, RetryPolicy())
+    transactions = bus.transactions
+    assert mcp.set_directions(0xFFFF)
+    assert mcp.set_pullups(0xFFFF)
+    assert mcp.write_outputs(mcp.olat)
+    assert bus.transactions == transactions
+
+def test_one_port_changing_is_one_byte_write():
+    bus = SimulatedBus()
+    mcp = configured(bus, RetryPolicy())
+    transactions = bus.transactions
+    assert mcp.set_directions(0x0000, 0x0100)
+    assert bus.transactions == transactions + 1
+    assert bus.expander(0, 0x20).word(0x00) == 0xFEFF
+    assert mcp.set_directions(0x0000, 0x0101)  # Only port A left to change
+    assert bus.transactions == transactions + 2
+    assert bus.expander(0, 0x20).word(0x00) == 0xFEFE
+
+def test_worker_merges_output_changes_into_one_olat_write():
+    from acquisition import AcquisitionWorker
+    bus = SimulatedBus()
+    retry = RetryPolicy()
+    worker = AcquisitionWorker(open_bus=None)
+    worker.tca = TCA9548A(bus, retry=retry)
+    worker.tca.select_channel(0)
+    worker.mcp_devices = [(0, configured(bus, retry, outputs=0x0007))]
+    for pin in range(3):
+        worker.write_pin(0x20, pin, True)
+    assert worker.commands.qsize() == 1
+    func, args = worker.commands.get_nowait()
+    transactions = bus.transactions
+    func(*args)
+    assert bus.transactions == transactions + 1
+    assert bus.expander(0, 0x20).word(0x14) == 0x0007
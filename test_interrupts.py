@@ -0,0 +1,73 @@
+from bus import SimulatedBus
+from hardware import TCA9548A, MCP23017
+from interrupts import InterruptMonitor
+from retry import RetryPolicy
+
+class FakeGPIO:
+    # Just enough of RPi.GPIO: edge callbacks are fired by the test, input() follows levels
+    IN = 1
+    PUD_UP = 22
+    FALLING = 32
+
+    def __init__(self):
+        self.callbacks = {}
+        self.levels = []  # Values returned by successive input() calls, 1 once exhausted
+
+    def setup(self, pin, direction, pull_up_down=None):
+        pass
+
+    def add_event_detect(self, pin, edge, callback=None):
+        self.callbacks[pin] = callback
+
+    def remove_event_detect(self, pin):
+        del self.callbacks[pin]
+
+    def input(self, pin):
+        return self.levels.pop(0)() if self.levels else 1
+
+def monitor():
+    bus = SimulatedBus(channels={1: [0x21]})
+    retry = RetryPolicy()
+    tca = TCA9548A(bus, retry=retry)
+    tca.select_channel(1)
+    mcp = MCP23017(bus, 0x21, channel=1, retry=retry)
+    mcp.configure_as_inputs_with_pullups()
+    changes = []
+    gpio = FakeGPIO()
+    on_change = lambda channel, mcp, flags, captured, current: changes.append((channel, flags, captured, current))
+    return bus, gpio, InterruptMonitor(gpio, tca, {17: [(1, mcp)]}, on_change), changes
+
+def test_start_enables_change_interrupts_on_every_input():
+    bus, gpio, interrupts, changes = monitor()
+    interrupts.start()
+    expander = bus.expander(1, 0x21)
+    assert expander.registers[0x0A] == 0x44  # IOCON: MIRROR, ODR
+    assert list(expander.registers[0x04:0x0A]) == [0xFF, 0xFF, 0, 0, 0, 0]  # GPINTEN, DEFVAL, INTCON
+    assert 17 in gpio.callbacks
+    interrupts.stop()
+    assert list(expander.registers[0x04:0x06]) == [0, 0]
+    assert gpio.callbacks == {}
+
+def test_edge_reports_the_captured_word():
+    bus, gpio, interrupts, changes = monitor()
+    interrupts.start()
+    bus.expander(1, 0x21).set_grounded(0x0104)
+    assert bus.expander(1, 0x21).interrupt_asserted()
+    gpio.callbacks[17](17)
+    assert changes == [(1, 0x0104, 0xFEFB, 0xFEFB)]
+    assert not bus.expander(1, 0x21).interrupt_asserted()
+
+def test_int_still_low_is_read_again():
+    bus, gpio, interrupts, changes = monitor()
+    interrupts.start()
+    expander = bus.expander(1, 0x21)
+    expander.set_grounded(0x0001)
+
+    def changed_while_reading():
+        expander.set_grounded(0x0003)  # Another pin closes before INT was sampled
+        return 0
+
+    gpio.levels = [changed_while_reading]
+    gpio.callbacks[17](17)
+    # Only port A latched a capture, INTCAPB keeps its reset value
+    assert changes == [(1, 0x0001, 0x00FE, 0xFFFE), (1, 0x0002, 0x00FC, 0xFFFC)]
@@ -0,0 +1,27 @@
+import topology
+from bus import SimulatedBus
+from multibus import BusScanner, DEFAULT_I2C_BUSES, i2c_buses
+
+def test_breaker_state_is_kept_per_bus(tmp_path, monkeypatch):
+    monkeypatch.setattr(topology, "TOPOLOGY_CACHE", str(tmp_path / "topology.json"))
+    buses = {1: SimulatedBus(), 3: SimulatedBus()}
+    scanners = [BusScanner(index, number, buses.get) for index, number in enumerate(buses)]
+    for scanner in scanners:
+        scanner.setup()
+    buses[1].dead.add((2, 0x22))
+    buses[3].expander(2, 0x22).set_grounded(0x0001)
+    for _ in range(4):
+        words, failed, rediscovered = scanners[0].scan()
+        assert failed == [2]
+        words, failed, rediscovered = scanners[1].scan()
+        assert failed == [] and words[2] == 0xFFFE
+    assert not scanners[0].retry.healthy((2, 0x22))
+    assert scanners[1].retry.healthy((2, 0x22))
+    for scanner in scanners:
+        scanner.executor.shutdown()
+
+def test_bad_bus_list_falls_back_to_the_default(monkeypatch):
+    monkeypatch.setenv("HARNESS_I2C_BUSES", "1,three")
+    assert i2c_buses() == list(DEFAULT_I2C_BUSES)
+    monkeypatch.setenv("HARNESS_I2C_BUSES", "1,3")
+    assert i2c_buses() == [1, 3]
@@ -0,0 +1,45 @@
+import json
+import random
+from acquisition import DeviceInfo
+from pinmap import PinDecoder, PinMap, DEFAULT_PIN_MAP, load_pin_map
+
+DEVICES = tuple(DeviceInfo(channel, 0x20 + channel, 0) for channel in range(3))
+
+def test_default_decode_matches_channel_bit_numbering():
+    decoder = PinDecoder(DEFAULT_PIN_MAP, DEVICES)
+    generator = random.Random(1)
+    for _ in range(100):
+        words = [generator.getrandbits(16) for _ in DEVICES]
+        states = decoder.decode(words)
+        assert states[0] == 0
+        for index, device in enumerate(DEVICES):
+            for bit in range(16):
+                assert states[device.channel * 16 + bit + 1] == (not words[index] >> bit & 1)
+
+def test_mapped_device_uses_its_table():
+    pins = [0] * 16
+    pins[15] = 1
+    pins[0] = 5
+    pin_map = PinMap({(0, 0x20): tuple(pins)})
+    device = DeviceInfo(0, 0x20, 0)
+    states = PinDecoder(pin_map, (device,)).decode([0x7FFF])
+    assert states == b"\x00\x01\x00\x00\x00\x00"
+
+def test_output_bits_never_decode_as_grounded():
+    device = DeviceInfo(0, 0x20, 0x0001)
+    states = PinDecoder(DEFAULT_PIN_MAP, (device,)).decode([0x0000])
+    assert states[1] == 0  # COM output driven low
+    assert states[2:17] == b"\x01" * 15
+
+def test_load_pin_map(tmp_path):
+    path = tmp_path / "pinmap.json"
+    path.write_text(json.dumps({"devices": [{"channel": 1, "address": "0x21", "pins": list(range(16, 0, -1))}]}))
+    pin_map = load_pin_map(str(path))
+    assert pin_map.device_pins(DeviceInfo(1, 0x21, 0))[0] == 16
+    assert pin_map.device_pins(DeviceInfo(2, 0x22, 0))[0] == 33
+
+def test_invalid_pin_map_falls_back_to_the_default(tmp_path):
+    path = tmp_path / "pinmap.json"
+    path.write_text(json.dumps({"devices": [{"channel": 0, "address": 32, "pins": [1, 2]}]}))
+    assert load_pin_map(str(path)) is DEFAULT_PIN_MAP
+    assert load_pin_map(str(tmp_path / "missing.json")) is DEFAULT_PIN_MAP
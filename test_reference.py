@@ -0,0 +1,20 @@
+import pytest
+from reference import parse_reference
+
+def test_rows_follow_the_reference():
+    reference = parse_reference("CbTp0002Dc02LoSe")
+    assert reference.n_pins == 2
+    assert reference.condition_names == ("Locking", "Seal")
+    assert [(typ, pin) for code, description, typ, pin in reference.rows] == [
+        ("LED", 1), ("PIN", 2), ("PIN", 3), ("COM", 4), ("CDN", 5), ("CDN", 6)]
+
+def test_parsed_references_are_cached_and_immutable():
+    reference = parse_reference("CbTp0002Dc08LoCoCoCoSlCpCvSe")
+    assert parse_reference("CbTp0002Dc08LoCoCoCoSlCpCvSe") is reference
+    with pytest.raises(AttributeError):
+        reference.n_pins = 3
+
+@pytest.mark.parametrize("code", ["", "CbTp2Dc00", "CbTp0002Dc02Lo", "CbTp0002Dc01lo"])
+def test_invalid_references_are_rejected(code):
+    with pytest.raises(ValueError):
+        parse_reference(code)
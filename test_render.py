@@ -0,0 +1,62 @@
+import render
+from render import TableRenderer
+
+class StubMaster:
+    def __init__(self):
+        self.jobs = []
+
+    def after(self, ms, callback):
+        self.jobs.append((ms, callback))
+        return len(self.jobs)
+
+    def after_cancel(self, job):
+        pass
+
+class StubTable:
+    def __init__(self):
+        self.drawn = []
+
+    def set_state(self, row, on):
+        self.drawn.append((row, on))
+
+class FakeClock:
+    def __init__(self, step):
+        self.now = 0.0
+        self.step = step
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
+
+def test_row_flipping_between_frames_is_drawn_once(monkeypatch):
+    monkeypatch.setattr(render.time, "perf_counter", FakeClock(0.0001))
+    master = StubMaster()
+    table = StubTable()
+    renderer = TableRenderer(master, table, fps=25)
+    renderer.set_state(5, True)
+    renderer.set_state(7, True)
+    renderer.set_state(5, False)
+    renderer.frame()
+    assert table.drawn == [(5, False), (7, True)]
+    assert master.jobs[-1][0] == 40  # Next frame already scheduled
+    renderer.frame()
+    assert table.drawn == [(5, False), (7, True)]  # Nothing changed, nothing drawn
+
+def test_rows_over_the_budget_are_carried_to_the_next_frame(monkeypatch):
+    monkeypatch.setattr(render.time, "perf_counter", FakeClock(0.003))  # Every row costs 3 ms
+    table = StubTable()
+    renderer = TableRenderer(StubMaster(), table, budget=0.008)
+    for row in range(1, 11):
+        renderer.set_state(row, True)
+    renderer.frame()
+    assert table.drawn == [(1, True), (2, True), (3, True)]
+    assert renderer.stats()["pending"] == 7 and renderer.overruns == 1
+    renderer.set_state(5, False)  # Changed again while waiting: keeps its place, drawn with the new state
+    renderer.set_state(1, False)
+    renderer.frame()
+    assert table.drawn[3:] == [(4, True), (5, False), (6, True)]
+    renderer.frame()
+    renderer.frame()
+    assert [row for row, on in table.drawn] == list(range(1, 11)) + [1]
+    assert table.drawn[-1] == (1, False)
+    assert renderer.stats()["pending"] == 0 and renderer.overruns == 3
@@ -0,0 +1,44 @@
+import time
+from acquisition import DeviceInfo
+from results import ResultLog, query_results, shift_report
+from verdict import PASS, Verdict
+
+DEVICES = (DeviceInfo(0, 0x20, 1), DeviceInfo(None, 0x21, 0))
+FAIL = Verdict(False, (3,), (), (17, 18))
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_full_batches_are_committed_at_once_and_the_rest_on_stop(tmp_path):
+    path = str(tmp_path / "results.db")
+    log = ResultLog(path, batch_size=3, flush_interval=1.0)
+    log.start()
+    for n in range(7):
+        log.record("op", "CbTp0002Dc00", 1000.0 + n, 1001.0 + n, PASS, DEVICES, [0xFFFF, 0xFFFE], scans=10, snapshots=2)
+    assert wait_for(lambda: log.written == 6)
+    time.sleep(0.2)
+    assert log.written == 6  # The last record waits for its batch to fill or the interval to pass
+    log.stop()
+    assert log.written == 7
+    assert len(query_results(path=path)) == 7
+
+def test_queries_and_shift_report(tmp_path):
+    path = str(tmp_path / "results.db")
+    log = ResultLog(path)
+    log.start()
+    log.record("op", "CbTp0002Dc00", 100.0, 101.0, PASS, DEVICES, [0xFFFF, 0xFFFF])
+    log.record("op", "CbTp0002Dc00", 200.0, 201.0, FAIL, DEVICES, [0xFFFB, 0xFFFC], scans=50, snapshots=4)
+    log.record("op", "CbTp0001Dc00", 300.0, 301.0, PASS, DEVICES, [0xFFFF, 0xFFFF])
+    log.stop()
+    results = query_results("CbTp0002Dc00", path=path)
+    assert [result.started for result in results] == [200.0, 100.0]
+    failed = results[0]
+    assert (failed.passed, failed.open_pins, failed.short_pins, failed.unreadable_pins) == (0, "3", "", "17,18")
+    assert failed.devices == "0:20,-:21"
+    assert failed.words == b"\xfb\xff\xfc\xff"
+    assert (failed.scans, failed.snapshots) == (50, 4)
+    assert [result.reference for result in query_results(start=150.0, end=400.0, limit=1, path=path)] == ["CbTp0001Dc00"]
+    assert shift_report(0.0, 1000.0, path=path) == [("CbTp0001Dc00", 1, 1, 0), ("CbTp0002Dc00", 2, 1, 1)]
@@ -0,0 +1,35 @@
+from acquisition import DeviceInfo
+from bus import SimulatedBus
+from hardware import TCA9548A, MCP23017, read_all_gpio
+from pinmap import PinMap
+from reference import parse_reference
+from retry import RetryPolicy
+from scan_plan import compile_scan_plan
+from verdict import compile_expected
+
+REFERENCE = parse_reference("CbTp0002Dc02LoSe")  # Logical pins 1-5
+
+def test_plan_skips_ports_without_judged_bits():
+    pin_map = PinMap({(0, 0x20): tuple(range(1, 9)) + (0,) * 8, (1, 0x21): (0,) * 16,
+                      (2, 0x22): (0,) * 8 + tuple(range(40, 48))})
+    devices = (DeviceInfo(0, 0x20, 0), DeviceInfo(1, 0x21, 0), DeviceInfo(2, 0x22, 0))
+    assert compile_scan_plan(REFERENCE, devices, pin_map) == (1, 0, 2)
+
+def test_plan_keeps_the_ports_that_catch_shorts():
+    bus = SimulatedBus(channels={0: [0x20], 1: [0x21]})
+    retry = RetryPolicy()
+    tca = TCA9548A(bus, retry=retry)
+    mcps = []
+    for channel in range(2):
+        mcp = MCP23017(bus, 0x20 + channel, channel=channel, retry=retry)
+        bus.mask = 1 << channel
+        mcp.configure_as_inputs_with_pullups()
+        mcps.append((channel, mcp))
+    devices = tuple(DeviceInfo(channel, mcp.address, 0) for channel, mcp in mcps)
+    plan = compile_scan_plan(REFERENCE, devices)
+    assert plan == (3, 3)  # No reference pin on channel 1 or GPIOB, but they must stay high
+    bus.expander(0, 0x20).set_grounded(0x001F)
+    bus.expander(1, 0x21).set_grounded(0x0100)  # Pin 25 shorted to GND
+    words, failed = read_all_gpio(tca, mcps, plan)
+    verdict = compile_expected(REFERENCE, devices).evaluate(words, failed)
+    assert verdict.short_pins == (25,)
@@ -0,0 +1,29 @@
+from scheduler import CycleScheduler, MAX_LATENESS_CYCLES
+
+def test_deadlines_do_not_drift_with_scan_time():
+    scheduler = CycleScheduler(0.01)
+    scheduler.deadline = 100.0
+    for cycle in range(100):
+        now = 100.0 + cycle * 0.01 + 0.004  # Every cycle starts 4 ms late
+        assert scheduler.due(now)
+        scheduler.tick(now)
+    assert abs(scheduler.deadline - 101.0) < 1e-9
+    stats = scheduler.stats()
+    assert abs(stats["achieved_hz"] - 100.0) < 1e-6
+    assert abs(stats["jitter_mean_ms"] - 4.0) < 1e-6
+    assert stats["skipped"] == 0
+
+def test_long_stall_resyncs_instead_of_bursting():
+    scheduler = CycleScheduler(0.01)
+    scheduler.deadline = 100.0
+    scheduler.tick(100.0)
+    scheduler.tick(100.505)  # Stalled for about 50 cycles
+    assert scheduler.skipped == 49
+    assert scheduler.delay(100.505) > 0
+    assert scheduler.stats()["jitter_max_ms"] < MAX_LATENESS_CYCLES * 10
+
+def test_set_rate():
+    scheduler = CycleScheduler(0.01)
+    scheduler.set_rate(500)
+    assert abs(scheduler.interval - 0.002) < 1e-12
+    assert scheduler.due()
@@ -0,0 +1,70 @@
+import json
+import socket
+import time
+from service import RemoteWorker, ScannerService, service_info, service_running
+
+def test_stale_socket_is_not_a_running_service(tmp_path):
+    path = str(tmp_path / "scanner.sock")
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen()
+    assert service_running(path)
+    listener.close()  # Killed service: the socket file stays behind
+    assert not service_running(path)
+    assert not service_running(str(tmp_path / "missing.sock"))
+
+class CountingWorker:
+    scans = 0
+
+def test_scans_command_reports_the_current_count():
+    worker = CountingWorker()
+    service = ScannerService(worker)
+    worker.scans = 1234
+    assert json.loads(service.command("scans", {})) == {"type": "scans", "scans": 1234}
+
+class IdleWorker:
+    started = False
+
+    def start(self):
+        self.started = True
+
+def test_service_refuses_to_take_over_a_live_socket(tmp_path):
+    path = str(tmp_path / "scanner.sock")
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen()
+    worker = IdleWorker()
+    assert ScannerService(worker, path).serve_forever() is False
+    assert not worker.started
+    assert service_running(path)
+    listener.close()
+
+class ComWorker(CountingWorker):
+    outputs = {0x20: 0x0001}
+
+def test_info_reports_the_driven_outputs():
+    worker = ComWorker()
+    worker.scans = 7
+    reply = json.loads(ScannerService(worker).command("info", {}))
+    assert reply == {"type": "info", "outputs": [[0x20, 0x0001]], "scans": 7}
+
+def test_service_info_without_a_service_is_none(tmp_path):
+    assert service_info(str(tmp_path / "missing.sock")) is None
+
+def test_remote_scans_come_from_the_stream(tmp_path):
+    path = str(tmp_path / "scanner.sock")
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen()
+    remote = RemoteWorker(path)
+    remote.start()
+    conn, _ = listener.accept()
+    assert json.loads(conn.makefile("rb").readline()) == {"cmd": "subscribe"}
+    conn.sendall(b'{"type":"scans","scans":42}\n')
+    deadline = time.monotonic() + 2.0
+    while remote.scans != 42 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert remote.scans == 42  # Read without a request of its own
+    remote.stop()
+    conn.close()
+    listener.close()
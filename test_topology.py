@@ -0,0 +1,58 @@
+import json
+from bus import SimulatedBus
+from hardware import TCA9548A
+from topology import TopologyManager
+
+def manager(bus, tmp_path):
+    return TopologyManager(bus, TCA9548A(bus), "test", cache_path=str(tmp_path / "topology.json"))
+
+def pairs(devices):
+    return [(channel, mcp.address) for channel, mcp in devices]
+
+def cached(tmp_path):
+    with open(tmp_path / "topology.json") as f:
+        return [tuple(pair) for pair in json.load(f)["test"]]
+
+def test_cached_topology_is_verified_instead_of_discovered(tmp_path):
+    bus = SimulatedBus(channels={0: [0x20], 3: [0x23]})
+    assert pairs(manager(bus, tmp_path).load()) == [(0, 0x20), (3, 0x23)]
+    assert cached(tmp_path) == [(0, 0x20), (3, 0x23)]
+    transactions = bus.transactions
+    topology = manager(bus, tmp_path)
+    topology.verify(topology.read_cache())
+    assert bus.transactions - transactions == 4  # One mux switch and one probe per device
+
+def test_dropout_does_not_shrink_the_fixture(tmp_path):
+    bus = SimulatedBus()
+    topology = manager(bus, tmp_path)
+    assert len(topology.load()) == 8
+    bus.dead.add((4, 0x24))
+    assert (4, 0x24) not in pairs(topology.rediscover())
+    assert topology.missing == [(4, 0x24)]
+    assert len(cached(tmp_path)) == 8
+    assert topology.recover() is None
+    bus.dead.clear()
+    assert pairs(topology.recover()) == [(channel, 0x20 + channel) for channel in range(8)]
+    assert topology.missing == []
+
+def test_missing_expander_survives_a_restart(tmp_path):
+    bus = SimulatedBus()
+    manager(bus, tmp_path).load()
+    bus.dead.add((4, 0x24))
+    topology = manager(bus, tmp_path)
+    assert len(topology.load()) == 7
+    assert topology.missing == [(4, 0x24)]
+    assert len(cached(tmp_path)) == 8
+    bus.dead.clear()
+    assert len(topology.recover()) == 8
+
+def test_recovered_expander_is_configured(tmp_path):
+    bus = SimulatedBus()
+    topology = manager(bus, tmp_path)
+    topology.load()
+    bus.dead.add((4, 0x24))
+    topology.rediscover()
+    bus.expander(4, 0x24).registers[0x0C] = 0x00  # Power cycled: pull-ups lost
+    bus.dead.clear()
+    topology.recover()
+    assert bus.expander(4, 0x24).registers[0x0C] == 0xFF
@@ -0,0 +1,20 @@
+from bus import SimulatedBus
+from tracing import TracingBus
+
+def test_same_address_in_different_mux_groups_is_kept_apart():
+    bus = TracingBus(SimulatedBus(channels={0: [0x20], 1: [0x21], 2: [0x20], 3: [0x21]}))
+    bus.write_byte(0x70, 0x03)
+    bus.read_i2c_block_data(0x20, 0x12, 2)
+    bus.write_byte(0x70, 0x0C)
+    bus.read_i2c_block_data(0x20, 0x12, 2)
+    bus.read_i2c_block_data(0x20, 0x12, 2)
+    devices = {(device["mask"], device["address"]): device["transactions"] for device in bus.stats()}
+    assert devices == {(None, 0x70): 2, (0x03, 0x20): 1, (0x0C, 0x20): 2}
+    assert "0x0c" in bus.report()
+
+def test_single_channel_selection_reports_the_channel():
+    bus = TracingBus(SimulatedBus())
+    bus.write_byte(0x70, 1 << 5)
+    bus.read_byte_data(0x25, 0x00)
+    entry = bus.recent(1)[0]
+    assert (entry["mask"], entry["channel"], entry["address"], entry["register"]) == (0x20, 5, 0x25, 0)
@@ -0,0 +1,57 @@
+from acquisition import DeviceInfo, PinSnapshot
+from bus import SimulatedBus
+from hardware import TCA9548A, read_all_gpio
+from retry import RetryPolicy
+from service import verdict_message
+from topology import TopologyManager
+from reference import parse_reference
+from verdict import compile_expected, describe, PASS
+
+DEVICES = (DeviceInfo(0, 0x20, 0), DeviceInfo(1, 0x21, 0))
+REFERENCE = parse_reference("CbTp0002Dc02LoSe")  # Logical pins 1-5
+
+def test_all_reference_pins_grounded_passes():
+    expected = compile_expected(REFERENCE, DEVICES)
+    assert expected.evaluate([0xFFE0, 0xFFFF]) is PASS
+
+def test_open_and_short_pins_are_listed():
+    verdict = compile_expected(REFERENCE, DEVICES).evaluate([0xFFE4, 0xFFFE])
+    assert not verdict.passed
+    assert verdict.open_pins == (3,)
+    assert verdict.short_pins == (17,)
+    assert describe(verdict) == "FAIL  open: 3  short: 17"
+
+def test_failed_device_makes_its_pins_unreadable():
+    verdict = compile_expected(REFERENCE, DEVICES).evaluate([0xFFE0, 0xFFFF], failed=(0,))
+    assert verdict.unreadable_pins == (1, 2, 3, 4, 5)
+
+def test_pins_without_an_expander_are_unreachable():
+    reference = parse_reference("CbTp0020Dc00")  # Logical pins 1-21, one expander has 16
+    verdict = compile_expected(reference, DEVICES[:1]).evaluate([0x0000])
+    assert verdict.unreadable_pins == tuple(range(17, 22))
+
+def test_com_output_pin_is_unreadable(tmp_path):
+    bus = SimulatedBus()
+    retry = RetryPolicy()
+    tca = TCA9548A(bus, retry=retry)
+    topology = TopologyManager(bus, tca, "test", cache_path=str(tmp_path / "topology.json"),
+                               outputs={0x20: 0x0001}, retry=retry)
+    devices = topology.load()
+    reference = parse_reference("CbTp0002Dc08LoCoCoCoSlCpCvSe")  # Pin 1 is the COM output A0 of 0x20
+    bus.expander(0, 0x20).set_grounded(0x07FE)  # Pins 2-11
+    words, failed = read_all_gpio(tca, devices)
+    info = tuple(DeviceInfo(channel, mcp.address, mcp.outputs) for channel, mcp in devices)
+    expected = compile_expected(reference, info)
+    assert expected.unreachable == (1,)
+    verdict = expected.evaluate(words, failed)
+    assert not verdict.passed and verdict.unreadable_pins == (1,)
+    assert verdict.open_pins == () and verdict.short_pins == ()
+    message = verdict_message(PinSnapshot(0.0, 1, info, tuple(words), tuple(failed)), reference)
+    assert not message["passed"] and message["unreadable_pins"] == [1]
+
+def test_output_bit_never_passes_its_pin():
+    reference = parse_reference("CbTp0001Dc00")
+    expected = compile_expected(reference, (DeviceInfo(0, 0x20, 0x0001),))
+    for word in (0xFFFC, 0xFFFD):  # Whatever the output bit reads back
+        verdict = expected.evaluate([word])
+        assert not verdict.passed and 1 in verdict.unreadable_pins
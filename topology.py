@@ -0,0 +1,131 @@
+import json
+import os
+from hardware import MCP23017, MCP23017_ADDR_BASE
+
+FIXTURE_ID = "default"  # Key of this station's fixture in the topology cache
+TOPOLOGY_CACHE = os.path.expanduser("~/.harness_topology.json")
+
+# One MCP23017 per mux channel, at MCP23017_ADDR_BASE + channel
+DEFAULT_CANDIDATES = [(channel, MCP23017_ADDR_BASE + channel) for channel in range(8)]
+
+class TopologyManager:
+    # Discovers which (mux channel, MCP23017 address) pairs are populated, caches the map on disk
+    # per fixture and only probes the bus again when the cached map no longer matches.
+    # The cached map only grows: an expander that stops answering (loose connector, brown-out)
+    # is dropped from the active devices and listed in missing, but stays known to the fixture,
+    # and recover() brings it back once it answers again. Delete the fixture's cache entry to
+    # really remove an expander.
+    def __init__(self, bus, tca, fixture_id=FIXTURE_ID, cache_path=None, candidates=None, outputs=None, retry=None):
+        self.bus = bus
+        self.tca = tca
+        self.fixture_id = fixture_id
+        self.cache_path = cache_path or TOPOLOGY_CACHE
+        self.retry = retry  # RetryPolicy of the bus's expanders, None for the default one
+        self.candidates = candidates or DEFAULT_CANDIDATES  # channel None = no channel switch
+        self.outputs = outputs or {}  # MCP23017 address -> mask of pins used as outputs
+        self.devices = []  # List of (mux channel, MCP23017) pairs
+        self.known = []  # Every (channel, address) pair of the fixture, as cached
+        self.missing = []  # Known pairs that did not answer the last discovery
+
+    def load(self):
+        pairs = self.read_cache()
+        if pairs is not None and self.verify(pairs):
+            self.known = pairs
+            self.missing = []
+        else:
+            self.known = pairs or []
+            pairs = self.update(self.discover())
+        self.devices = self.configure(pairs)
+        return self.devices
+
+    def rediscover(self):
+        self.devices = self.configure(self.update(self.discover()))
+        return self.devices
+
+    def update(self, found):
+        # Merge a discovery into the known pairs, the cache is only written when it gained a pair
+        known = [pair for pair in self.candidates if pair in found or pair in self.known]
+        known += [pair for pair in self.known + found if pair not in known]
+        if known != self.known:
+            self.write_cache(known)
+        self.known = known
+        self.missing = [pair for pair in known if pair not in found]
+        if self.missing:
+            print(f"{len(self.missing)} known MCP23017 device(s) not answering: "
+                  + ", ".join(f"{channel}/{address:#x}" for channel, address in self.missing))
+        return found
+
+    def recover(self):
+        # Probe the missing pairs once; returns the new device list when any of them answered,
+        # None otherwise. Devices that never went away are kept as they are.
+        back = []
+        for channel, address in self.missing:
+            self.select(channel)
+            mcp = MCP23017(self.bus, address, channel=channel, retry=self.retry)
+            if mcp.probe():
+                mcp.retry.success(mcp.key)  # It answered: close the breaker tripped while it was gone
+                back.append((channel, address))
+        if not back:
+            return None
+        print(f"Recovered {len(back)} MCP23017 device(s) for fixture {self.fixture_id}.")
+        self.missing = [pair for pair in self.missing if pair not in back]
+        current = {(channel, mcp.address): (channel, mcp) for channel, mcp in self.devices}
+        recovered = dict(zip(back, self.configure(back)))
+        self.devices = [current.get(pair) or recovered[pair] for pair in self.known if pair not in self.missing]
+        return self.devices
+
+    def discover(self):
+        pairs = []
+        for channel, address in self.candidates:
+            self.select(channel)
+            if MCP23017(self.bus, address, channel=channel, retry=self.retry).probe():
+                pairs.append((channel, address))
+        print(f"Discovered {len(pairs)} MCP23017 device(s) for fixture {self.fixture_id}.")
+        return pairs
+
+    def verify(self, pairs):
+        # A single read per cached device; any miss means the fixture changed
+        for channel, address in pairs:
+            self.select(channel)
+            if not MCP23017(self.bus, address, channel=channel, retry=self.retry).probe():
+                return False
+        return True
+
+    def configure(self, pairs):
+        devices = []
+        for channel, address in pairs:
+            self.select(channel)
+            mcp = MCP23017(self.bus, address, outputs=self.outputs.get(address, 0x0000), channel=channel,
+                           retry=self.retry)
+            mcp.configure_as_inputs_with_pullups()
+            devices.append((channel, mcp))
+        return devices
+
+    def select(self, channel):
+        if channel is not None:
+            self.tca.select_channel(channel)
+
+    def read_cache(self):
+        try:
+            with open(self.cache_path) as f:
+                pairs = json.load(f).get(self.fixture_id)
+        except (OSError, ValueError):
+            return None
+        if pairs is None:
+            return None
+        return [(channel, address) for channel, address in pairs]
+
+    def write_cache(self, pairs):
+        try:
+            with open(self.cache_path) as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+        cache[self.fixture_id] = [[channel, address] for channel, address in pairs]
+        tmp_path = self.cache_path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(cache, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Could not write topology cache {self.cache_path}: {e}")
@@ -0,0 +1,187 @@
+import json
+import os
+import threading
+import time
+from array import array
+
+TRACE_BUFFER_SIZE = 4096  # Transactions kept in the ring buffer, oldest are overwritten
+HISTOGRAM_BUCKETS = 16  # Bucket i counts transactions of [2**(i-1), 2**i) us, the last one everything slower
+TRACE_DUMP_PATH = os.path.expanduser("~/harness_i2c_trace.json")
+
+# Operation codes stored in the ring buffer
+OPERATIONS = ["write_byte", "read_byte", "read_byte_data", "write_byte_data",
+              "read_i2c_block_data", "write_i2c_block_data"]
+
+class TracingBus:
+    # Wraps an SMBus-like object and records every transaction: operation, device, register,
+    # duration and outcome go into fixed-size ring buffers (plain arrays, no allocation per call),
+    # and per-device latency histograms and error counts are aggregated as calls complete.
+    # Devices are keyed by (mux mask, address); the mask is the last one written to the TCA9548A
+    # (None for the mux itself or before the first write). With several channels selected at once
+    # (mux_groups) the mask still tells same-address devices of different groups apart.
+    def __init__(self, bus, mux_address=0x70, size=TRACE_BUFFER_SIZE):
+        self.bus = bus
+        self.mux_address = mux_address
+        self.size = size
+        self.lock = threading.Lock()
+        self.mask = None  # Last mask written to the mux
+        self.head = 0  # Total transactions recorded, head % size is the next slot
+        self.timestamps = array('d', [0.0]) * size
+        self.durations = array('L', [0]) * size  # ns
+        self.operations = array('B', [0]) * size
+        self.masks = array('h', [-1]) * size
+        self.addresses = array('B', [0]) * size
+        self.registers = array('h', [-1]) * size
+        self.outcomes = array('B', [0]) * size  # 1 = ok, 0 = OSError
+        self.histograms = {}  # (mask, address) -> array of HISTOGRAM_BUCKETS counts
+        self.errors = {}  # (mask, address) -> failed transactions
+        self.total_ns = {}  # (mask, address) -> summed duration
+
+    def record(self, operation, address, register, start, ok):
+        duration = time.perf_counter_ns() - start
+        mask = None if address == self.mux_address else self.mask
+        key = (mask, address)
+        with self.lock:
+            i = self.head % self.size
+            self.head += 1
+            self.timestamps[i] = time.time()
+            self.durations[i] = duration
+            self.operations[i] = operation
+            self.masks[i] = -1 if mask is None else mask
+            self.addresses[i] = address
+            self.registers[i] = register
+            self.outcomes[i] = ok
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = array('L', [0]) * HISTOGRAM_BUCKETS
+                self.errors[key] = 0
+                self.total_ns[key] = 0
+            histogram[min((duration // 1000).bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+            self.total_ns[key] += duration
+            if not ok:
+                self.errors[key] += 1
+
+    def call(self, operation, address, register, func, *args):
+        start = time.perf_counter_ns()
+        try:
+            result = func(*args)
+        except OSError:
+            self.record(operation, address, register, start, 0)
+            raise
+        self.record(operation, address, register, start, 1)
+        return result
+
+    def write_byte(self, address, value):
+        result = self.call(0, address, -1, self.bus.write_byte, address, value)
+        if address == self.mux_address:
+            self.mask = value & 0xFF
+        return result
+
+    def read_byte(self, address):
+        return self.call(1, address, -1, self.bus.read_byte, address)
+
+    def read_byte_data(self, address, reg):
+        return self.call(2, address, reg, self.bus.read_byte_data, address, reg)
+
+    def write_byte_data(self, address, reg, value):
+        return self.call(3, address, reg, self.bus.write_byte_data, address, reg, value)
+
+    def read_i2c_block_data(self, address, reg, length):
+        return self.call(4, address, reg, self.bus.read_i2c_block_data, address, reg, length)
+
+    def write_i2c_block_data(self, address, reg, data):
+        return self.call(5, address, reg, self.bus.write_i2c_block_data, address, reg, data)
+
+    def close(self):
+        self.bus.close()
+
+    def __getattr__(self, name):
+        # Anything else (e.g. SimulatedBus.expander) goes straight to the wrapped bus
+        return getattr(self.bus, name)
+
+    def recent(self, count=None):
+        # Most recent transactions, oldest first, as dicts
+        with self.lock:
+            n = min(self.head, self.size)
+            if count is not None:
+                n = min(n, count)
+            entries = []
+            for j in range(self.head - n, self.head):
+                i = j % self.size
+                entries.append({
+                    "time": self.timestamps[i],
+                    "operation": OPERATIONS[self.operations[i]],
+                    "mask": None if self.masks[i] < 0 else self.masks[i],
+                    "channel": channel_of(None if self.masks[i] < 0 else self.masks[i]),
+                    "address": self.addresses[i],
+                    "register": None if self.registers[i] < 0 else self.registers[i],
+                    "us": self.durations[i] / 1000,
+                    "ok": bool(self.outcomes[i]),
+                })
+        return entries
+
+    def stats(self):
+        # Per-device summary: transaction count, error rate, mean and approximate p50/p99 latency
+        with self.lock:
+            devices = []
+            for key in sorted(self.histograms, key=repr):
+                histogram = list(self.histograms[key])
+                count = sum(histogram)
+                devices.append({
+                    "mask": key[0],
+                    "channel": channel_of(key[0]),
+                    "address": key[1],
+                    "transactions": count,
+                    "errors": self.errors[key],
+                    "error_rate": self.errors[key] / count,
+                    "mean_us": self.total_ns[key] / count / 1000,
+                    "p50_us": percentile(histogram, count, 0.50),
+                    "p99_us": percentile(histogram, count, 0.99),
+                    "histogram": histogram,
+                })
+        return devices
+
+    def reset(self):
+        with self.lock:
+            self.head = 0
+            self.histograms = {}
+            self.errors = {}
+            self.total_ns = {}
+
+    def report(self):
+        lines = [f"{'mux':>7} {'address':>7} {'count':>9} {'errors':>7} {'err %':>6} "
+                 f"{'mean us':>8} {'p50 us':>7} {'p99 us':>7}"]
+        for device in self.stats():
+            if device["mask"] is None:
+                mux = "-"
+            elif device["channel"] is not None:
+                mux = device["channel"]
+            else:
+                mux = f"{device['mask']:#04x}"  # Several channels selected at once
+            lines.append(f"{mux:>7} {device['address']:#7x} {device['transactions']:>9} {device['errors']:>7} "
+                         f"{device['error_rate']:6.1%} {device['mean_us']:8.1f} "
+                         f"{device['p50_us']:>7} {device['p99_us']:>7}")
+        return "\n".join(lines)
+
+    def dump(self, path=TRACE_DUMP_PATH):
+        try:
+            with open(path, "w") as f:
+                json.dump({"devices": self.stats(), "transactions": self.recent()}, f, indent=1)
+        except OSError as e:
+            print(f"Could not write I2C trace {path}: {e}")
+            return False
+        return True
+
+def channel_of(mask):
+    # Mux channel of a single-channel mask, None for no mask or several channels
+    return mask.bit_length() - 1 if mask and not mask & (mask - 1) else None
+
+def percentile(histogram, count, fraction):
+    # Upper bound in us of the histogram bucket holding the given fraction of transactions
+    target = fraction * count
+    seen = 0
+    for bucket, n in enumerate(histogram):
+        seen += n
+        if seen >= target:
+            return 1 << bucket
+    return 1 << (len(histogram) - 1)
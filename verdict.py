@@ -0,0 +1,92 @@
+from array import array
+from collections import namedtuple
+from functools import lru_cache
+from pinmap import DEFAULT_PIN_MAP
+
+EXPECTATION_CACHE_SIZE = 64  # (reference, device layout) pairs kept compiled
+
+# Result of judging one snapshot. Pin numbers are the logical pins of the table (see
+# pinmap.PinMap): open_pins should read GND but don't, short_pins read GND but
+# shouldn't, unreadable_pins are expected on an expander that is missing or failed to read.
+Verdict = namedtuple("Verdict", ["passed", "open_pins", "short_pins", "unreadable_pins"])
+
+PASS = Verdict(True, (), (), ())
+
+class ExpectedMasks:
+    # A reference compiled against the device layout of the acquisition worker. Every pin with
+    # a table row (PIN, COM and CDN rows) must read 0, i.e. be closed to GND through the
+    # harness; every other wired input must stay 1. Output bits (COM driver) and bits the pin
+    # map leaves unwired are not judged, and a reference pin only found on an output bit is
+    # reported unreadable: the output never tells whether it is closed to GND.
+    # must_low[i] / must_high[i] are the masks for devices[i], so judging a snapshot is two ANDs
+    # per device.
+    __slots__ = ("reference", "devices", "pins", "must_low", "must_high", "unreachable")
+
+    def __init__(self, reference, devices, pin_map=DEFAULT_PIN_MAP):
+        self.reference = reference
+        self.devices = devices
+        self.pins = [pin_map.device_pins(device) for device in devices]
+        # Logical pins 1 .. n_pins + 1 + conditions, see HarnessReference.rows
+        last_pin = len(reference.rows) - 1
+        self.must_low = array('H', [0]) * len(devices)
+        self.must_high = array('H', [0]) * len(devices)
+        covered = set()
+        for index, device in enumerate(devices):
+            inputs = 0xFFFF & ~device.outputs
+            low = 0
+            wired = 0
+            for bit, pin in enumerate(self.pins[index]):
+                if pin:
+                    wired |= 1 << bit
+                if 1 <= pin <= last_pin and inputs >> bit & 1:
+                    low |= 1 << bit
+                    covered.add(pin)
+            self.must_low[index] = low & inputs
+            self.must_high[index] = ~low & wired & inputs
+        self.unreachable = tuple(pin for pin in range(1, last_pin + 1) if pin not in covered)
+
+    def evaluate(self, words, failed=()):
+        bad = False
+        for index, word in enumerate(words):
+            if self.must_low[index] & word or self.must_high[index] & ~word:
+                bad = True
+                break
+        if not bad and not failed and not self.unreachable:
+            return PASS
+        return self.offending(words, failed)
+
+    def offending(self, words, failed):
+        # Slow path, only taken for failing snapshots: list the pins responsible
+        open_pins = []
+        short_pins = []
+        unreadable_pins = list(self.unreachable)
+        for index, word in enumerate(words):
+            device_pins = self.pins[index]
+            if index in failed:
+                unreadable_pins.extend(device_pins[bit] for bit in range(16) if self.must_low[index] >> bit & 1)
+                continue
+            for pins, bits in ((open_pins, self.must_low[index] & word), (short_pins, self.must_high[index] & ~word)):
+                while bits:
+                    bit = (bits & -bits).bit_length() - 1
+                    bits &= bits - 1
+                    pins.append(device_pins[bit])
+        open_pins.sort()
+        short_pins.sort()
+        unreadable_pins.sort()
+        return Verdict(not (open_pins or short_pins or unreadable_pins), tuple(open_pins), tuple(short_pins),
+                       tuple(unreadable_pins))
+
+@lru_cache(maxsize=EXPECTATION_CACHE_SIZE)
+def compile_expected(reference, devices, pin_map=DEFAULT_PIN_MAP):
+    # devices is the tuple of DeviceInfo carried by every PinSnapshot
+    return ExpectedMasks(reference, devices, pin_map)
+
+def describe(verdict):
+    # One line for the UI / log
+    if verdict.passed:
+        return "PASS"
+    parts = []
+    for name, pins in (("open", verdict.open_pins), ("short", verdict.short_pins), ("unreadable", verdict.unreadable_pins)):
+        if pins:
+            parts.append(f"{name}: " + ", ".join(str(pin) for pin in pins))
+    return "FAIL  " + "  ".join(parts)